@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import AnalyticsMetric
+
+
+@admin.register(AnalyticsMetric)
+class AnalyticsMetricAdmin(admin.ModelAdmin):
+    list_display = ['date', 'user', 'event_count', 'tickets_sold', 'ticket_sales', 'total_sales', 'average_rating']
+    list_filter = ['date']
+    list_select_related = ['user']
+    search_fields = ['user__email']
+    date_hierarchy = 'date'
+
+    # Срезы пишет только rollup_analytics
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
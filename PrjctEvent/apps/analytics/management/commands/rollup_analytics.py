@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.analytics.models import AnalyticsMetric
+from apps.analytics.rollups import rollup
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные срезы AnalyticsMetric (по умолчанию — с последнего посчитанного дня)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Первый пересчитываемый день (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Последний пересчитываемый день (YYYY-MM-DD)')
+        parser.add_argument('--rebuild', action='store_true', help='Удалить все срезы и посчитать с начала истории')
+
+    def handle(self, *args, **options):
+        since, until = (self.parse(options[name]) for name in ('since', 'until'))
+        if options['rebuild']:
+            AnalyticsMetric.objects.all().delete()
+        count = rollup(since, until)
+        self.stdout.write(f'Записано строк: {count}')
+
+    def parse(self, value):
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Неверная дата: {value}')
+        return day
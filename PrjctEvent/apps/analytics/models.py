@@ -6,15 +6,37 @@ from apps.notifications.models import Notification
 User = get_user_model()
 
 class AnalyticsMetric(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    event_count = models.IntegerField(default=0)
-    ticket_sales = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    average_rating = models.FloatField(default=0)
+    """
+    Дневной срез аналитики организатора, заполняется задачей rollup_analytics.
+    Поля без total_ — значения за день, total_ — нарастающий итог на конец дня.
+    Строка с user=None — общие показатели сайта (пользователи).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='analytics_metrics')
+    date = models.DateField('Дата')
+    event_count = models.IntegerField('Создано событий', default=0)
+    tickets_sold = models.IntegerField('Продано билетов', default=0)
+    ticket_sales = models.DecimalField('Выручка', max_digits=10, decimal_places=2, default=0)
+    review_count = models.IntegerField('Отзывов', default=0)
+    rating_sum = models.IntegerField('Сумма оценок', default=0)
+    average_rating = models.FloatField('Средняя оценка', default=0)
+    total_events = models.IntegerField('Всего событий', default=0)
+    total_tickets_sold = models.IntegerField('Всего продано билетов', default=0)
+    total_sales = models.DecimalField('Выручка всего', max_digits=14, decimal_places=2, default=0)
+    # Снимок на момент пересчёта, а не за день: отзывы — из Event.rating_*, уведомления — из таблицы
+    total_reviews = models.IntegerField('Всего отзывов', default=0)
+    total_rating_sum = models.IntegerField('Сумма всех оценок', default=0)
+    notifications_sent = models.IntegerField('Отправлено уведомлений', default=0)
+    notifications_read = models.IntegerField('Прочитано уведомлений', default=0)
+    new_users = models.IntegerField('Новых пользователей', default=0)
+    total_users = models.IntegerField('Всего пользователей', default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = 'Метрика аналитики'
         verbose_name_plural = 'Метрики аналитики'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_analytics_user_date'),
+        ]
         
     
         
@@ -0,0 +1,156 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.events.models import Event, Review
+from apps.notifications.models import Notification
+from apps.tickets.models import RevenueEntry
+from .models import AnalyticsMetric
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def daily(queryset, field, group_by, **aggregates):
+    """{(group, day): {...}} за период одним запросом; TruncDate переносим между СУБД."""
+    rows = queryset.annotate(day=TruncDate(field)).values(group_by, 'day').annotate(**aggregates)
+    return {(row[group_by], row['day']): row for row in rows}
+
+
+def default_since():
+    """
+    Начало пересчёта: последний посчитанный день минус ANALYTICS_ROLLUP_LOOKBACK_DAYS
+    (отзывы, одобренные модератором позже), при пустой таблице — начало истории.
+    """
+    last = AnalyticsMetric.objects.aggregate(last=Max('date'))['last']
+    if last:
+        return last - timedelta(days=settings.ANALYTICS_ROLLUP_LOOKBACK_DAYS)
+    first = min(
+        filter(None, [
+            get_user_model().objects.aggregate(first=Min('date_joined'))['first'],
+            Event.objects.aggregate(first=Min('created_at'))['first'],
+        ]),
+        default=timezone.now(),
+    )
+    return timezone.localdate(first)
+
+
+def rollup(since=None, until=None):
+    """
+    Пересчитывает дневные строки AnalyticsMetric за [since, until]. Каждая
+    таблица читается одним сгруппированным запросом за весь период, итоги
+    продолжаются от строк предыдущего дня — история до since не читается.
+    Возвращает число записанных строк.
+    """
+    until = until or timezone.localdate()
+    last = AnalyticsMetric.objects.aggregate(last=Max('date'))['last']
+    since = since or default_since()
+    if last and since > last + timedelta(days=1):
+        # Нельзя пропускать дни: итоги считаются от строки предыдущего дня
+        since = last + timedelta(days=1)
+    if since > until:
+        return 0
+    start, end = day_start(since), day_start(until + timedelta(days=1))
+
+    events = daily(
+        Event.objects.filter(created_at__gte=start, created_at__lt=end),
+        'created_at', 'author_id', count=Count('id'),
+    )
+    # Журнал выручки: продажи в день подтверждения, отмены — отрицательными суммами
+    sales = daily(
+        RevenueEntry.objects.filter(created_at__gte=start, created_at__lt=end),
+        'created_at', 'organizer_id', tickets=Sum('quantity'), amount=Sum('amount'),
+    )
+    reviews = daily(
+        Review.objects.filter(approved=True, created_at__gte=start, created_at__lt=end),
+        'created_at', 'event__author_id', count=Count('id'), rating_sum=Sum('rating'),
+    )
+    new_users = {
+        row['day']: row['count']
+        for row in get_user_model().objects.filter(date_joined__gte=start, date_joined__lt=end)
+        .annotate(day=TruncDate('date_joined')).values('day').annotate(count=Count('id'))
+    }
+    active = defaultdict(set)
+    for author_id, day in (*events, *sales, *reviews):
+        active[day].add(author_id)
+
+    previous = {
+        metric.user_id: metric
+        for metric in AnalyticsMetric.objects.filter(date=since - timedelta(days=1))
+    }
+    site = previous.pop(None, None)
+    total_users = (
+        site.total_users if site
+        else get_user_model().objects.filter(date_joined__lt=start).count()
+    )
+
+    # Итоги по отзывам — из агрегатов событий (Event.rating_*), которые Review
+    # поддерживает сам: отзыв, одобренный позже окна пересчёта, иначе не попал бы
+    # ни в один день. Как и уведомления, это снимок на момент пересчёта.
+    ratings = {
+        row['author_id']: row
+        for row in Event.objects.filter(rating_count__gt=0).values('author_id').annotate(
+            count=Sum('rating_count'), total=Sum('rating_sum'),
+        ).order_by()
+    }
+
+    organizer_ids = set(previous).union(*active.values(), ratings)
+    notifications = {
+        row['user_id']: row
+        for row in Notification.objects.filter(user_id__in=organizer_ids).values('user_id').annotate(
+            sent=Count('id', filter=Q(is_sent=True)),
+            read=Count('id', filter=Q(is_read=True)),
+        )
+    }
+
+    metrics = []
+    day = since
+    while day <= until:
+        total_users += new_users.get(day, 0)
+        metrics.append(AnalyticsMetric(
+            user=None, date=day, new_users=new_users.get(day, 0), total_users=total_users
+        ))
+
+        # Организатор, у которого за период есть только одобренные отзывы, появляется в последнем дне
+        for user_id in set(previous) | active[day] | (set(ratings) if day == until else set()):
+            prev = previous.get(user_id) or AnalyticsMetric()
+            created = events.get((user_id, day), {})
+            sold = sales.get((user_id, day), {})
+            rated = reviews.get((user_id, day), {})
+            noted = notifications.get(user_id, {})
+            rating = ratings.get(user_id, {})
+            metric = AnalyticsMetric(
+                user_id=user_id,
+                date=day,
+                event_count=created.get('count', 0),
+                tickets_sold=sold.get('tickets') or 0,
+                ticket_sales=sold.get('amount') or Decimal(0),
+                review_count=rated.get('count', 0),
+                rating_sum=rated.get('rating_sum') or 0,
+                notifications_sent=noted.get('sent', 0),
+                notifications_read=noted.get('read', 0),
+            )
+            metric.total_events = prev.total_events + metric.event_count
+            metric.total_tickets_sold = prev.total_tickets_sold + metric.tickets_sold
+            metric.total_sales = prev.total_sales + metric.ticket_sales
+            metric.total_reviews = rating.get('count') or 0
+            metric.total_rating_sum = rating.get('total') or 0
+            metric.average_rating = (
+                round(metric.total_rating_sum / metric.total_reviews, 2) if metric.total_reviews else 0
+            )
+            metrics.append(metric)
+            previous[user_id] = metric
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        AnalyticsMetric.objects.filter(date__gte=since, date__lte=until).delete()
+        AnalyticsMetric.objects.bulk_create(metrics, batch_size=1000)
+    return len(metrics)
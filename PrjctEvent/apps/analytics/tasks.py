@@ -0,0 +1,7 @@
+from celery import shared_task
+from .rollups import rollup
+
+
+@shared_task
+def rollup_analytics():
+    return rollup()
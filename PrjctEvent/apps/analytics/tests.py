@@ -1,3 +1,100 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.events.models import Event, Review
+from apps.notifications.counters import unread_count
+from .models import AnalyticsMetric
+from .rollups import rollup
+
+
+TOTALS = ('total_events', 'total_tickets_sold', 'total_sales', 'total_reviews', 'total_rating_sum', 'average_rating')
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        self.organizer = users.create_user(email='organizer@example.com', password=None)
+        self.guests = [users.create_user(email=f'guest{i}@example.com', password=None) for i in range(3)]
+        self.now = timezone.now()
+
+    def create_event(self, days_ago):
+        event = Event.objects.create(
+            title=f'Событие {days_ago}', description='-', short_description='-', author=self.organizer
+        )
+        Event.objects.filter(pk=event.pk).update(created_at=self.now - timedelta(days=days_ago))
+        return event
+
+    def create_review(self, event, guest, rating, days_ago, approved=True):
+        review = Review.objects.create(user=guest, event=event, rating=rating, approved=approved)
+        Review.objects.filter(pk=review.pk).update(created_at=self.now - timedelta(days=days_ago))
+        review.refresh_from_db()
+        return review
+
+    def latest(self):
+        metric = AnalyticsMetric.objects.filter(user=self.organizer).order_by('-date').first()
+        return {field: getattr(metric, field) for field in TOTALS}
+
+    def test_backfill_then_incremental_matches_full_backfill(self):
+        first = self.create_event(20)
+        self.create_review(first, self.guests[0], 5, 15)
+        rollup(until=timezone.localdate() - timedelta(days=5))
+
+        self.create_event(3)
+        # Отзыв написан до окна пересчёта, а одобрен только сейчас
+        late = self.create_review(first, self.guests[1], 2, 10, approved=False)
+        late.approved = True
+        late.save()
+        rollup()
+        incremental = self.latest()
+
+        AnalyticsMetric.objects.all().delete()
+        rollup()
+        self.assertEqual(incremental, self.latest())
+        self.assertEqual((incremental['total_events'], incremental['total_reviews']), (2, 2))
+        self.assertEqual(incremental['average_rating'], 3.5)
+
+    def test_organizer_with_only_a_late_approval_gets_a_row(self):
+        event = self.create_event(30)
+        rollup(until=timezone.localdate() - timedelta(days=20))
+        AnalyticsMetric.objects.filter(user=self.organizer).delete()
+
+        review = self.create_review(event, self.guests[0], 4, 25, approved=False)
+        review.approved = True
+        review.save()
+        rollup()
+        self.assertEqual(self.latest()['total_reviews'], 1)
+
+
+@override_settings(TEMPLATES=[{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+        'analytics/dashboard.html': '{{ events_chart }}{{ review_stats }}{{ user_stats }}{{ ticket_stats }}',
+    })]},
+}])
+class OrganizerDashboardQueryTests(TestCase):
+    def setUp(self):
+        self.organizer = get_user_model().objects.create_user(email='dashboard@example.com', password=None)
+        self.organizer.profile.role = 'organizer'
+        self.organizer.profile.save()
+        # Строка счётчика непрочитанных создаётся при первом чтении — не в замеряемом запросе
+        unread_count(self.organizer)
+        self.client.force_login(self.organizer)
+
+    def create_history(self, days):
+        today = timezone.localdate()
+        AnalyticsMetric.objects.bulk_create([
+            AnalyticsMetric(user=user, date=today - timedelta(days=day), event_count=1)
+            for day in range(days) for user in (None, self.organizer)
+        ])
+
+    def test_query_count_does_not_depend_on_history(self):
+        for days in (30, 3 * 365):
+            AnalyticsMetric.objects.all().delete()
+            self.create_history(days)
+            # Сессия, пользователь, профиль, 4 запроса к срезам, итог выручки, счётчик непрочитанных
+            with self.subTest(days=days), self.assertNumQueries(9):
+                self.client.get(reverse('analytics:dashboard'))
@@ -1,18 +1,22 @@
 from typing import Any
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
-from django.db.models import Count, Avg, Sum
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-from collections import defaultdict
 from datetime import timedelta
 from .models import AnalyticsMetric
-from apps.events.models import Event
-from apps.users.models import User
-from apps.tickets.models import Ticket
-from apps.notifications.models import Notification
+from apps.notifications.counters import unread_count
+from apps.tickets import revenue
 
 
 class OrganizerDashboard(LoginRequiredMixin, TemplateView):
+    """
+    Дашборд читает только готовые дневные срезы (rollup_analytics): окно
+    фиксированной длины и последнюю строку, поэтому число читаемых строк
+    не зависит от объёма истории.
+    """
     template_name = 'analytics/dashboard.html'
     
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
@@ -22,44 +26,48 @@ class OrganizerDashboard(LoginRequiredMixin, TemplateView):
         if user.profile.role != 'organizer' and not user.is_staff:
             return ctx
         
-        now = timezone.now()
-        month_ago = now - timedelta(days=30)
+        today = timezone.localdate()
+        month_ago = today - timedelta(days=settings.ANALYTICS_DASHBOARD_DAYS)
+        year_ago = (today - timedelta(days=31 * settings.ANALYTICS_DASHBOARD_MONTHS)).replace(day=1)
+        metrics = AnalyticsMetric.objects.filter(user=user)
+        latest = metrics.order_by('-date').first() or AnalyticsMetric()
         
-        events_data = Event.objects.filter(
-            author=user,
-            created_at__gte=month_ago
-        ).extra({'month': "strftime('%%Y-%%m', created_at)"}).values('month').annotate(count=Count('id')).order_by('month')
-        events_labels = [item['month'] for item in events_data]
-        events_data_points = [item['count'] for item in events_data]
+        monthly = (
+            metrics.filter(date__gte=year_ago)
+            .annotate(month=TruncMonth('date'))
+            .values('month')
+            .annotate(count=Sum('event_count'), sales=Sum('ticket_sales'))
+            .order_by('month')
+        )
         ctx['events_chart'] = {
-            'labels': events_labels,
-            'data': events_data_points,
+            'labels': [item['month'].strftime('%Y-%m') for item in monthly],
+            'data': [item['count'] for item in monthly],
+        }
+        ctx['sales_chart'] = {
+            'labels': ctx['events_chart']['labels'],
+            'data': [float(item['sales']) for item in monthly],
         }
         
-        new_users = User.objects.filter(date_joined__gte=month_ago).count()
-        total_users = User.objects.count()
+        site = AnalyticsMetric.objects.filter(user__isnull=True, date__gt=month_ago)
         ctx['user_stats'] = {
-            'new_users': new_users,
-            'total_users': total_users,
+            'new_users': site.aggregate(total=Sum('new_users'))['total'] or 0,
+            'total_users': getattr(site.order_by('-date').first(), 'total_users', 0),
         }
         
-        tickets = Ticket.objects.filter(event__author=user)
-        total_sales = tickets.aggregate(total=Sum('price'))['total'] or 0
+        # Итог журнала выручки — актуален сразу, без ожидания пересчёта срезов
+        sales = revenue.totals(organizer=user)
         ctx['ticket_stats'] = {
-            'total_sales': float(total_sales),
-            'ticket_count': tickets.count(),
+            'total_sales': float(sales['amount']),
+            'ticket_count': sales['quantity'],
         }
         
-        reviews_avg = tickets.aggregate(avg_rating=Avg('reviews__rating'))['avg_rating'] or 0
-        ctx['review_stats'] = {'average_rating': reviews_avg or 0}
+        ctx['review_stats'] = {'average_rating': latest.average_rating}
         
-        notifications = Notification.objects.filter(user=user)
-        sent = notifications.filter(is_sent=True).count()
-        read = notifications.filter(is_read=True).count()
         ctx['notification_stats'] = {
-            'sent': sent,
-            'read': read,
-            'unread': notifications.count() - read,
+            'sent': latest.notifications_sent,
+            'read': latest.notifications_read,
+            'unread': unread_count(user),
         }
+        ctx['metrics_date'] = latest.date
         
         return ctx
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import weakref
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+
+from apps.events import fragment_cache
+from .models import ChatMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+def save_messages(messages, batch_size):
+    """
+    Пишет сообщения пачкой. Если БД отклонила пачку из-за отдельных строк
+    (например, событие удалили, пока чат был открыт), сообщения пишутся по
+    одному, а отклонённые отбрасываются — иначе одна строка блокировала бы
+    буфер всех комнат. Ошибки соединения пробрасываются: пачку повторит flush.
+    """
+    try:
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create(messages, batch_size=batch_size)
+        saved = messages
+    except (IntegrityError, DataError):
+        saved = []
+        for message in messages:
+            try:
+                with transaction.atomic():
+                    ChatMessage.objects.bulk_create([message])
+            except (IntegrityError, DataError) as e:
+                logger.warning(f"Chat message for event {message.event_id} dropped: {e}")
+            else:
+                saved.append(message)
+    # bulk_create минует post_save, а последние сообщения входят в кэшированную карточку события
+    fragment_cache.invalidate(*{f'event:{message.event_id}' for message in saved})
+    return len(saved)
+
+
+class MessageBuffer:
+    """
+    Буфер сообщений чата на процесс (event loop). Сообщения всех комнат
+    копятся в памяти и пишутся одним bulk_create, когда набралось
+    CHAT_FLUSH_SIZE штук или прошло CHAT_FLUSH_INTERVAL_MS с первого
+    сообщения в буфере — вместо INSERT на каждое сообщение.
+    """
+
+    def __init__(self, size=None, interval_ms=None):
+        self.size = size or settings.CHAT_FLUSH_SIZE
+        self.interval = (interval_ms or settings.CHAT_FLUSH_INTERVAL_MS) / 1000
+        self.messages = []
+        self.timer = None
+        self.lock = asyncio.Lock()
+
+    async def add(self, message):
+        self.messages.append(message)
+        if len(self.messages) >= self.size:
+            await self.flush()
+        else:
+            self.schedule()
+
+    def schedule(self):
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().create_task(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(self.interval)
+        self.timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        async with self.lock:
+            messages, self.messages = self.messages, []
+            if not messages:
+                return 0
+            try:
+                saved = await database_sync_to_async(save_messages)(messages, self.size)
+            except Exception:
+                logger.exception(f"Chat flush of {len(messages)} messages failed")
+                # Повтор при следующем сбросе; сверх лимита старые сообщения теряются
+                self.messages[:0] = messages[-settings.CHAT_BUFFER_LIMIT:]
+                self.schedule()
+                return 0
+        return saved
+
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_buffer():
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        buffer = _buffers[loop] = MessageBuffer()
+    return buffer
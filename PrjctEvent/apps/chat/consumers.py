@@ -1,32 +1,108 @@
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+import asyncio
 import json
+import logging
+
+from apps.events.models import Event
+from .buffer import get_buffer
+from .models import ChatMessage
+from .outbox import TokenBucket, get_outbox
+from .presence import get_presence
+
+logger = logging.getLogger(__name__)
+
+# Код закрытия для переполненной комнаты (диапазон 4000-4999 — прикладные коды)
+ROOM_FULL = 4029
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    heartbeat_task = None
+
     async def connect(self):
         self.event_slug = self.scope['url_route']['kwargs']['event_slug']
         self.room_group_name = f'chat_{self.event_slug}'
+        self.event_id = await database_sync_to_async(
+            lambda: Event.objects.filter(slug=self.event_slug).values_list('pk', flat=True).first()
+        )()
+        if self.event_id is None:
+            await self.close()
+            return
 
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
+        # Сначала записываемся, потом считаем: при гонке лишний уйдёт, но лимит не превысится
+        user = self.scope['user']
+        presence = get_presence()
+        await presence.join(self.room_group_name, self.channel_name, user.pk, settings.CHAT_PRESENCE_TTL)
+        count = await presence.count(self.room_group_name)
+        limit = settings.CHAT_ROOM_MAX_MEMBERS
+        if limit and count > limit and not user.is_staff:
+            await presence.leave(self.room_group_name, self.channel_name, user.pk)
+            await self.send(text_data=json.dumps({'type': 'error', 'error': 'room_full'}))
+            await self.close(code=ROOM_FULL)
+            return
+
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        self.bucket = TokenBucket(settings.CHAT_RATE_LIMIT, settings.CHAT_RATE_BURST)
+        self.heartbeat_task = asyncio.get_running_loop().create_task(self.heartbeat())
+        await self.send_presence(count)
+
+    async def heartbeat(self):
+        """Продлевает присутствие и заодно сообщает клиенту актуальное число участников."""
+        presence = get_presence()
+        user_id = self.scope['user'].pk
+        while True:
+            await asyncio.sleep(settings.CHAT_PRESENCE_HEARTBEAT)
+            try:
+                await presence.heartbeat(self.room_group_name, self.channel_name, user_id, settings.CHAT_PRESENCE_TTL)
+                await self.send_presence()
+            except Exception as e:
+                # Пропущенный пульс не страшен: запись живёт CHAT_PRESENCE_TTL
+                logger.warning(f"Chat presence heartbeat for {self.room_group_name} failed: {e}")
+
+    async def send_presence(self, count=None):
+        if count is None:
+            count = await get_presence().count(self.room_group_name)
+        await self.send(text_data=json.dumps({'type': 'presence', 'count': count}))
 
     async def disconnect(self, close_code):
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            await get_presence().leave(self.room_group_name, self.channel_name, self.scope['user'].pk)
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        # Не держим сообщения ушедшего пользователя до таймера
+        await get_buffer().flush()
 
     async def receive(self, text_data):
         data = json.loads(text_data)
+        if data.get('type') == 'presence':
+            await self.send_presence()
+            return
         message = data.get('message', '')
+        if not message:
+            return
+        if not self.bucket.allow():
+            await self.send(text_data=json.dumps({'type': 'error', 'error': 'rate_limited'}))
+            return
+        user = self.scope['user']
+        timestamp = timezone.now()
+
+        if user.is_authenticated:
+            # В БД сообщение попадает пачкой, рассылка его не ждёт
+            await get_buffer().add(ChatMessage(
+                event_id=self.event_id, user_id=user.pk, message=message, timestamp=timestamp
+            ))
+
+        # В группу уходит не каждое сообщение, а пачка комнаты раз в CHAT_COALESCE_MS
+        await get_outbox(self.channel_layer).add(self.room_group_name, {
+            'message': message,
+            'username': user.email if user.is_authenticated else 'Гость',
+            'timestamp': timestamp.isoformat(),
+        })
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message,
-                'username': self.scope['user'].email if self.scope['user'].is_authenticated else 'Гость',
-            }
-        )
-
-    async def chat_message(self, event):
-        await self.send(text_data=json.dumps({
-            'message': event['message'],
-            'username': event['username'],
-        }))
+    async def chat_batch(self, event):
+        # Формат кадра: {'type': 'messages', 'messages': [{'message', 'username', 'timestamp'}, ...]}
+        # Кадр уже сериализован отправителем — получателю остаётся только send
+        await self.send(text_data=event['frame'])
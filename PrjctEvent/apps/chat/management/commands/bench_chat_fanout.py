@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from apps.chat.routing import websocket_urlpatterns
+from apps.events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный генератор для чата: N подписчиков в одной комнате, несколько отправителей. '
+        'Соединения открываются через ASGI-приложение в процессе; замеряется время, за которое '
+        'все подписчики получили все сообщения, со склейкой кадров и без неё (CHAT_COALESCE_MS=0). '
+        'InMemoryChannelLayer сам тратит O(каналов) на каждую отправку — для реальных цифр нужен --redis.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', help='Слаг события (по умолчанию — первое событие)')
+        parser.add_argument('--subscribers', type=int, default=1000)
+        parser.add_argument('--publishers', type=int, default=10)
+        parser.add_argument('--messages', type=int, default=10, help='Сообщений на отправителя')
+        parser.add_argument('--tick', type=int, nargs='+', default=[0, 50], help='Значения CHAT_COALESCE_MS')
+        parser.add_argument('--redis', action='store_true', help='Слой каналов из настроек вместо InMemoryChannelLayer')
+        parser.add_argument('--timeout', type=float, default=120)
+
+    def handle(self, *args, **options):
+        events = Event.objects.filter(slug=options['event']) if options['event'] else Event.objects.order_by('pk')
+        event = events.first()
+        if event is None:
+            raise CommandError('Нет события для комнаты чата.')
+
+        overrides = {'CHAT_RATE_LIMIT': 0, 'CHAT_ROOM_MAX_MEMBERS': 0}
+        if not options['redis']:
+            overrides['CHANNEL_LAYERS'] = {'default': {
+                'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                'CONFIG': {'capacity': 100000},
+            }}
+        total = options['publishers'] * options['messages']
+        for tick in options['tick']:
+            with override_settings(CHAT_COALESCE_MS=tick, **overrides):
+                elapsed, frames, delivered = asyncio.run(self.run(event.slug, options))
+            expected = total * options['subscribers']
+            self.stdout.write(
+                f'CHAT_COALESCE_MS={tick:<4} {options["subscribers"]} подписчиков, {total} сообщений: '
+                f'{elapsed:6.2f} s, кадров: {frames}, доставлено: {delivered}/{expected} '
+                f'({delivered / elapsed:,.0f} сообщений/с)'
+            )
+
+    async def connect(self, app, slug):
+        communicator = WebsocketCommunicator(app, f'/ws/chat/{slug}/')
+        communicator.scope['user'] = AnonymousUser()
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise CommandError('Соединение отклонено.')
+        await communicator.receive_from()  # начальный presence
+        return communicator
+
+    async def consume(self, communicator, expected, timeout):
+        frames = received = 0
+        while received < expected:
+            data = json.loads(await communicator.receive_from(timeout=timeout))
+            if data['type'] == 'messages':
+                frames += 1
+                received += len(data['messages'])
+        return frames, received
+
+    async def run(self, slug, options):
+        app = URLRouter(websocket_urlpatterns)
+        subscribers = [await self.connect(app, slug) for _ in range(options['subscribers'])]
+        publishers = [await self.connect(app, slug) for _ in range(options['publishers'])]
+        expected = options['publishers'] * options['messages']
+
+        started = time.perf_counter()
+        consumers = [
+            asyncio.ensure_future(self.consume(subscriber, expected, options['timeout']))
+            for subscriber in subscribers
+        ]
+        for i in range(options['messages']):
+            for n, publisher in enumerate(publishers):
+                await publisher.send_to(text_data=json.dumps({'message': f'{n}:{i}'}))
+        try:
+            results = await asyncio.gather(*consumers)
+        except asyncio.TimeoutError:
+            raise CommandError('Подписчики не получили все сообщения за отведённое время.')
+        elapsed = time.perf_counter() - started
+
+        for communicator in subscribers + publishers:
+            await communicator.disconnect()
+        return elapsed, sum(frames for frames, _ in results), sum(received for _, received in results)
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from apps.events.models import Event
 
 User = get_user_model()
@@ -9,10 +10,15 @@ class ChatMessage(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='messages')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Время приёма консьюмером, а не записи: сообщения пишутся в БД пачками
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Курсорная подгрузка истории: WHERE event = ... AND (timestamp, id) < (...)
+            models.Index(fields=['event', 'timestamp', 'id'], name='chat_event_ts_id_idx'),
+        ]
         
     def __str__(self):
         return f'{self.user.email}: {self.message[:50]}'    
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import logging
+import time
+import weakref
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ограничение частоты сообщений соединения: rate в секунду, всплеск до burst."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RoomOutbox:
+    """
+    Исходящие сообщения комнат процесса. Сообщения комнаты копятся
+    CHAT_COALESCE_MS (или до CHAT_COALESCE_MAX_BATCH штук) и уходят в группу
+    одним group_send с уже готовым JSON-кадром: сериализация — раз на пачку,
+    а не на каждое сообщение у каждого получателя.
+    """
+
+    def __init__(self, layer, tick_ms=None, max_batch=None):
+        self.layer = layer
+        self.tick = (tick_ms if tick_ms is not None else settings.CHAT_COALESCE_MS) / 1000
+        self.max_batch = max_batch or settings.CHAT_COALESCE_MAX_BATCH
+        self.rooms = {}
+        self.timers = {}
+
+    async def add(self, group, message):
+        batch = self.rooms.setdefault(group, [])
+        batch.append(message)
+        if len(batch) >= self.max_batch or not self.tick:
+            await self.flush(group)
+        elif group not in self.timers:
+            self.timers[group] = asyncio.get_running_loop().create_task(self.flush_later(group))
+
+    async def flush_later(self, group):
+        await asyncio.sleep(self.tick)
+        self.timers.pop(group, None)
+        try:
+            await self.flush(group)
+        except Exception:
+            logger.exception(f"Chat batch for {group} was not delivered")
+
+    async def flush(self, group):
+        timer = self.timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.rooms.pop(group, None)
+        if not batch:
+            return 0
+        frame = json.dumps({'type': 'messages', 'messages': batch})
+        await self.layer.group_send(group, {'type': 'chat_batch', 'frame': frame})
+        return len(batch)
+
+
+_outboxes = weakref.WeakKeyDictionary()
+
+
+def get_outbox(layer):
+    loop = asyncio.get_running_loop()
+    outbox = _outboxes.get(loop)
+    if outbox is None or outbox.layer is not layer:
+        outbox = _outboxes[loop] = RoomOutbox(layer)
+    return outbox
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+import weakref
+
+import redis.asyncio as redis
+from django.conf import settings
+
+
+# Присутствие в комнатах чата: каждое соединение — запись с временем
+# истечения. Консьюмер продлевает её раз в CHAT_PRESENCE_HEARTBEAT секунд,
+# поэтому соединения упавшего процесса исчезают сами через CHAT_PRESENCE_TTL.
+
+
+def member_key(channel_name, user_id):
+    return f'{channel_name}|{user_id or ""}'
+
+
+def user_of(member):
+    user_id = member.rpartition('|')[2]
+    return int(user_id) if user_id else None
+
+
+class LocalPresence:
+    """Присутствие в памяти процесса — для InMemoryChannelLayer, разработки и тестов."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rooms = {}
+
+    def _prune(self, room, now):
+        members = self.rooms.get(room, {})
+        for member in [m for m, expires in members.items() if expires <= now]:
+            del members[member]
+        if not members:
+            self.rooms.pop(room, None)
+        return members
+
+    async def join(self, room, channel_name, user_id, ttl):
+        with self.lock:
+            self.rooms.setdefault(room, {})[member_key(channel_name, user_id)] = time.time() + ttl
+
+    heartbeat = join
+
+    async def leave(self, room, channel_name, user_id):
+        with self.lock:
+            self.rooms.get(room, {}).pop(member_key(channel_name, user_id), None)
+            self._prune(room, time.time())
+
+    async def count(self, room):
+        with self.lock:
+            return len(self._prune(room, time.time()))
+
+    async def rooms_stats(self):
+        now = time.time()
+        with self.lock:
+            rooms = {room: list(self._prune(room, now)) for room in list(self.rooms)}
+        return [
+            {'room': room, 'connections': len(members), 'users': len({user_of(m) for m in members} - {None})}
+            for room, members in rooms.items()
+        ]
+
+
+class RedisPresence:
+    """
+    Присутствие в Redis: sorted set на комнату (member = канал|пользователь,
+    score = время истечения) и общий set комнат для staff-эндпоинта.
+    Видно всем процессам, как и группы RedisChannelLayer.
+    """
+    rooms_key = 'chat:presence:rooms'
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def room_key(self, room):
+        return f'chat:presence:{room}'
+
+    async def join(self, room, channel_name, user_id, ttl):
+        key = self.room_key(room)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {member_key(channel_name, user_id): time.time() + ttl})
+            pipe.expire(key, ttl)
+            pipe.sadd(self.rooms_key, room)
+            await pipe.execute()
+
+    heartbeat = join
+
+    async def leave(self, room, channel_name, user_id):
+        await self.client.zrem(self.room_key(room), member_key(channel_name, user_id))
+
+    async def count(self, room):
+        key = self.room_key(room)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(key, '-inf', time.time())
+            pipe.zcard(key)
+            _, count = await pipe.execute()
+        return count
+
+    async def rooms_stats(self):
+        stats = []
+        now = time.time()
+        for room in await self.client.smembers(self.rooms_key):
+            key = self.room_key(room)
+            await self.client.zremrangebyscore(key, '-inf', now)
+            members = await self.client.zrange(key, 0, -1)
+            if not members:
+                # Ключ комнаты истёк или опустел — убираем её из списка
+                await self.client.srem(self.rooms_key, room)
+                continue
+            stats.append({
+                'room': room,
+                'connections': len(members),
+                'users': len({user_of(m) for m in members} - {None}),
+            })
+        return stats
+
+
+_local = LocalPresence()
+_redis = weakref.WeakKeyDictionary()
+
+
+def uses_redis():
+    backend = settings.CHAT_PRESENCE_BACKEND
+    if not backend:
+        # По умолчанию — туда же, где живут группы слоя каналов
+        backend = 'redis' if 'redis' in settings.CHANNEL_LAYERS['default']['BACKEND'].lower() else 'local'
+    return backend == 'redis'
+
+
+def get_presence():
+    if not uses_redis():
+        return _local
+    # Асинхронный клиент привязан к event loop, поэтому он свой у каждого цикла
+    loop = asyncio.get_running_loop()
+    presence = _redis.get(loop)
+    if presence is None:
+        presence = _redis[loop] = RedisPresence(settings.CHAT_PRESENCE_REDIS_URL)
+    return presence
@@ -1,3 +1,218 @@
-from django.test import TestCase
+import asyncio
+import time
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.events.models import Event
+from . import presence
+from .buffer import MessageBuffer
+from .consumers import ROOM_FULL
+from .models import ChatMessage
+from .routing import websocket_urlpatterns
+
+
+IN_MEMORY_CHAT = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'CHAT_PRESENCE_BACKEND': 'local',
+}
+
+
+@override_settings(**IN_MEMORY_CHAT, CHAT_ROOM_MAX_MEMBERS=2)
+class ChatPresenceConsumerTests(TransactionTestCase):
+    def setUp(self):
+        presence._local.rooms.clear()
+        users = get_user_model().objects
+        self.users = [users.create_user(email=f'chat{i}@example.com', password=None) for i in range(3)]
+        self.staff = users.create_user(email='moderator@example.com', password=None, is_staff=True)
+        # Рассылка о новом событии уходит в Celery после коммита — брокер тестам не нужен
+        with mock.patch('apps.notifications.signals.fan_out_notifications.delay'):
+            self.event = Event.objects.create(
+                title='Чат', slug='chat-room', description='-', short_description='-', author=self.users[0]
+            )
+        self.room = f'chat_{self.event.slug}'
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.event.slug}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_join_and_leave_update_the_count(self):
+        first = await self.connect(self.users[0])
+        self.assertEqual(await first.receive_json_from(), {'type': 'presence', 'count': 1})
+        second = await self.connect(self.users[1])
+        self.assertEqual(await second.receive_json_from(), {'type': 'presence', 'count': 2})
+
+        await second.disconnect()
+        await first.send_json_to({'type': 'presence'})
+        self.assertEqual(await first.receive_json_from(), {'type': 'presence', 'count': 1})
+        await first.disconnect()
+        self.assertEqual(await presence.get_presence().count(self.room), 0)
+
+    @override_settings(CHAT_PRESENCE_TTL=60)
+    async def test_connection_without_heartbeat_expires(self):
+        communicator = await self.connect(self.users[0])
+        await communicator.receive_json_from()
+        # Пульса не было дольше CHAT_PRESENCE_TTL — как у соединения упавшего процесса
+        with mock.patch.object(presence.time, 'time', return_value=time.time() + 61):
+            self.assertEqual(await presence.get_presence().count(self.room), 0)
+        await communicator.disconnect()
+
+    async def test_full_room_rejects_members_but_not_staff(self):
+        members = [await self.connect(user) for user in self.users[:2]]
+        rejected = await self.connect(self.users[2])
+        self.assertEqual(await rejected.receive_json_from(), {'type': 'error', 'error': 'room_full'})
+        self.assertEqual(await rejected.receive_output(), {'type': 'websocket.close', 'code': ROOM_FULL})
+
+        moderator = await self.connect(self.staff)
+        self.assertEqual(await moderator.receive_json_from(), {'type': 'presence', 'count': 3})
+        for communicator in (*members, moderator):
+            await communicator.disconnect()
+
+
+@override_settings(**IN_MEMORY_CHAT)
+class ChatPresenceViewTests(TestCase):
+    def setUp(self):
+        presence._local.rooms.clear()
+        self.url = reverse('chat:chat_presence')
+
+    def test_non_staff_is_forbidden(self):
+        self.client.force_login(get_user_model().objects.create_user(email='member@example.com', password=None))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_staff_sees_rooms(self):
+        staff = get_user_model().objects.create_user(email='admin@example.com', password=None, is_staff=True)
+        presence._local.rooms['chat_concert'] = {presence.member_key('channel', staff.pk): time.time() + 60}
+        self.client.force_login(staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['rooms'], [
+            {'room': 'chat_concert', 'connections': 1, 'users': 1, 'event_slug': 'concert'},
+        ])
+
+
+class MessageBufferTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='writer@example.com', password=None)
+        with mock.patch('apps.notifications.signals.fan_out_notifications.delay'):
+            self.event = Event.objects.create(title='Буфер', description='-', short_description='-', author=self.user)
+
+    def message(self, text, **kwargs):
+        return ChatMessage(event_id=self.event.pk, user_id=self.user.pk, message=text, **kwargs)
+
+    async def stored(self):
+        return await database_sync_to_async(ChatMessage.objects.count)()
+
+    async def test_flush_by_size(self):
+        buffer = MessageBuffer(size=3, interval_ms=60_000)
+        for index in range(2):
+            await buffer.add(self.message(str(index)))
+        self.assertEqual(await self.stored(), 0)
+        await buffer.add(self.message('2'))
+        self.assertEqual(await self.stored(), 3)
+
+    async def test_flush_by_interval(self):
+        buffer = MessageBuffer(size=100, interval_ms=10)
+        await buffer.add(self.message('тик'))
+        self.assertEqual(await self.stored(), 0)
+        await asyncio.sleep(0.1)
+        self.assertEqual(await self.stored(), 1)
+
+    async def test_rejected_row_does_not_block_the_batch(self):
+        buffer = MessageBuffer(size=100, interval_ms=60_000)
+        await buffer.add(self.message('до'))
+        # Событие удалили, пока чат был открыт
+        await buffer.add(ChatMessage(event_id=self.event.pk + 1000, user_id=self.user.pk, message='потеряно'))
+        await buffer.add(self.message('после'))
+        self.assertEqual(await buffer.flush(), 2)
+        self.assertEqual(buffer.messages, [])
+        texts = await database_sync_to_async(lambda: sorted(ChatMessage.objects.values_list('message', flat=True)))()
+        self.assertEqual(texts, ['до', 'после'])
+
+
+@override_settings(**IN_MEMORY_CHAT, CHAT_FLUSH_INTERVAL_MS=60_000)
+class ChatDisconnectFlushTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='leaver@example.com', password=None)
+        with mock.patch('apps.notifications.signals.fan_out_notifications.delay'):
+            self.event = Event.objects.create(
+                title='Выход', slug='leave-room', description='-', short_description='-', author=self.user
+            )
+
+    async def test_disconnect_flushes_pending_messages(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.event.slug}/')
+        communicator.scope['user'] = self.user
+        await communicator.connect()
+        await communicator.send_json_to({'message': 'пока'})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+        count = await database_sync_to_async(ChatMessage.objects.filter(event=self.event).count)()
+        self.assertEqual(count, 1)
+
+
+@override_settings(CHAT_HISTORY_PAGE_SIZE=2)
+class ChatHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(email='history@example.com', password=None)
+        cls.event = Event.objects.create(title='История', description='-', short_description='-', author=user)
+        # Пять сообщений в одну и ту же микросекунду: порядок держится только на id
+        moment = timezone.now()
+        ChatMessage.objects.bulk_create([
+            ChatMessage(event=cls.event, user=user, message=str(index), timestamp=moment) for index in range(5)
+        ])
+        cls.url = reverse('chat:chat_history', kwargs={'slug': cls.event.slug})
+
+    def test_pages_cover_equal_timestamps_once(self):
+        seen, params = [], {}
+        while True:
+            data = self.client.get(self.url, params).json()
+            seen = [message['message'] for message in data['messages']] + seen
+            if not data['next_cursor']:
+                break
+            params = {'before': data['next_cursor']}
+        self.assertEqual(seen, ['0', '1', '2', '3', '4'])
+
+    def test_invalid_cursor_is_not_found(self):
+        cursor = self.client.get(self.url).json()['next_cursor']
+        for token in ('garbage', cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')):
+            with self.subTest(token=token):
+                self.assertEqual(self.client.get(self.url, {'before': token}).status_code, 404)
+
+
+@override_settings(
+    **IN_MEMORY_CHAT, CHAT_COALESCE_MS=200, CHAT_RATE_LIMIT=0.1, CHAT_RATE_BURST=3, CHAT_FLUSH_INTERVAL_MS=60_000
+)
+class ChatOutboxConsumerTests(TransactionTestCase):
+    def setUp(self):
+        presence._local.rooms.clear()
+        self.user = get_user_model().objects.create_user(email='talker@example.com', password=None)
+        with mock.patch('apps.notifications.signals.fan_out_notifications.delay'):
+            self.event = Event.objects.create(
+                title='Склейка', slug='batch-room', description='-', short_description='-', author=self.user
+            )
+
+    async def test_quick_sends_arrive_as_one_frame_and_excess_is_rate_limited(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.event.slug}/')
+        communicator.scope['user'] = self.user
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        for index in range(4):
+            await communicator.send_json_to({'message': f'm{index}'})
+        # Четвёртое сообщение сверх всплеска отклоняется сразу, до отправки пачки
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'error', 'error': 'rate_limited'})
+
+        frame = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(frame['type'], 'messages')
+        self.assertEqual([message['message'] for message in frame['messages']], ['m0', 'm1', 'm2'])
+        self.assertEqual({message['username'] for message in frame['messages']}, {self.user.email})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import ChatHistoryView, ChatPresenceView
+
+app_name = 'chat'
+
+urlpatterns = [
+    path('presence/', ChatPresenceView.as_view(), name='chat_presence'),
+    path('<slug:slug>/history/', ChatHistoryView.as_view(), name='chat_history'),
+]
@@ -1,3 +1,87 @@
-from django.shortcuts import render
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core import signing
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
+from django.views import View
 
-# Create your views here.
+from apps.events.models import Event
+from .models import ChatMessage
+from .presence import get_presence
+
+
+CURSOR_SALT = 'chat.history.cursor'
+
+
+def encode_cursor(message):
+    """Подписанный курсор истории: (timestamp, id) последнего отданного сообщения."""
+    return signing.dumps([message.timestamp.isoformat(), message.pk], salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    try:
+        value, pk = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise Http404('Неверный курсор.')
+    value = parse_datetime(value)
+    if value is None:
+        raise Http404('Неверный курсор.')
+    return value, pk
+
+
+class ChatHistoryView(View):
+    """
+    История чата события от новых к старым. ?before=<cursor> отдаёт
+    сообщения старше курсора: поиск по индексу (event, timestamp, id)
+    без OFFSET, поэтому глубокая прокрутка стоит столько же, сколько первая.
+    """
+
+    def get(self, request, slug, *args, **kwargs):
+        event_id = get_object_or_404(Event.objects.values_list('pk', flat=True), slug=slug)
+        page_size = settings.CHAT_HISTORY_PAGE_SIZE
+
+        queryset = ChatMessage.objects.filter(event_id=event_id)
+        token = request.GET.get('before')
+        if token:
+            timestamp, pk = decode_cursor(token)
+            queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+        rows = list(
+            queryset.select_related('user').order_by('-timestamp', '-id')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        return JsonResponse({
+            # Для отображения — в хронологическом порядке
+            'messages': [
+                {
+                    'id': message.pk,
+                    'message': message.message,
+                    'username': message.user.email,
+                    'timestamp': message.timestamp.isoformat(),
+                }
+                for message in reversed(rows)
+            ],
+            'next_cursor': encode_cursor(rows[-1]) if has_more else None,
+        })
+
+
+class ChatPresenceView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Число соединений и пользователей в комнатах чата, самые людные — первыми."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        rooms = async_to_sync(self.get_rooms)()
+        for room in rooms:
+            room['event_slug'] = room['room'].removeprefix('chat_')
+        rooms.sort(key=lambda room: room['connections'], reverse=True)
+        return JsonResponse({'rooms': rooms, 'max_members': settings.CHAT_ROOM_MAX_MEMBERS})
+
+    async def get_rooms(self):
+        return await get_presence().rooms_stats()
@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from .models import Category, Tag, Event, Review
+from .ratings import rebuild_ratings
+from apps.notifications.tasks import notify_event_registrants
 
 
 # Админка для Category
@@ -28,21 +31,35 @@ admin.site.register(Tag, TagAdmin)
 # Админка для Event
 class EventAdmin(admin.ModelAdmin):
     list_display = (
-        'title', 'category', 'author', 'status', 'start_datetime', 'end_datetime', 'views_count', 'created_at', 'updated_at'
+        'title', 'category', 'author', 'status', 'start_datetime', 'end_datetime', 'views_count',
+        'average_rating', 'rating_count', 'created_at', 'updated_at'
     )
     list_filter = ('status', 'category', 'author', 'start_datetime', 'end_datetime', 'tags')
     search_fields = ('title', 'description', 'slug', 'author__username')
     prepopulated_fields = {'slug': ('title',)}
     ordering = ['-start_datetime']
+    actions = ['remind_registrants']
 
     def average_rating(self, obj):
         return obj.average_rating() or _('Нет отзывов')
 
     average_rating.short_description = _('Средний рейтинг')
+    average_rating.admin_order_field = 'rating_avg'
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.prefetch_related('tags', 'reviews')
+        return queryset.select_related('category', 'author')
+
+    def remind_registrants(self, request, queryset):
+        for event in queryset:
+            notify_event_registrants(
+                event,
+                title=f"Напоминание: {event.title}",
+                message=f"Событие '{event.title}' начнётся {timezone.localtime(event.start_datetime):%d.%m.%Y в %H:%M}.",
+            )
+        self.message_user(request, _('Рассылка напоминаний поставлена в очередь.'))
+
+    remind_registrants.short_description = _('Напомнить участникам о событии')
 
 admin.site.register(Event, EventAdmin)
 
@@ -56,11 +73,18 @@ class ReviewAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     actions = ['approve_reviews', 'reject_reviews']
 
+    def set_approved(self, queryset, approved):
+        # События собираются до update: в списке с фильтром по approved
+        # ленивый queryset после обновления уже пуст
+        event_ids = list(queryset.values_list('event_id', flat=True).distinct())
+        queryset.update(approved=approved)
+        rebuild_ratings(Event.objects.filter(pk__in=event_ids))
+
     def approve_reviews(self, request, queryset):
-        queryset.update(approved=True)
+        self.set_approved(queryset, True)
 
     def reject_reviews(self, request, queryset):
-        queryset.update(approved=False)
+        self.set_approved(queryset, False)
 
     approve_reviews.short_description = _('Одобрить выбранные отзывы')
     reject_reviews.short_description = _('Отклонить выбранные отзывы')
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+import redis
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Event
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalViewBuffer:
+    """
+    Буфер в памяти процесса. Сбрасывается самим процессом при записи
+    просмотра, когда истёк интервал — подходит для разработки и тестов.
+    """
+    inline_flush = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.last_flush = time.monotonic()
+
+    def add(self, event_id, amount=1):
+        with self.lock:
+            self.counts[event_id] += amount
+
+    def is_due(self, interval):
+        return time.monotonic() - self.last_flush >= interval
+
+    def pop(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.last_flush = time.monotonic()
+        return dict(counts)
+
+    def ack(self):
+        pass
+
+    def restore(self, counts):
+        with self.lock:
+            self.counts.update(counts)
+
+
+class RedisViewBuffer:
+    """
+    Общий буфер в Redis-хэше. pop() атомарно переименовывает накопленный
+    хэш в processing-ключ; ключ удаляется только после записи в БД, поэтому
+    при падении воркера счётчики будут применены повторно (at-least-once).
+    """
+    inline_flush = False
+    pending_key = 'events:views:pending'
+    processing_key = 'events:views:processing'
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+
+    def add(self, event_id, amount=1):
+        self.client.hincrby(self.pending_key, event_id, amount)
+
+    def is_due(self, interval):
+        return False
+
+    def lock(self, timeout):
+        return self.client.lock('events:views:flush-lock', timeout=timeout, blocking=False)
+
+    def pop(self):
+        if not self.client.exists(self.processing_key):
+            try:
+                self.client.rename(self.pending_key, self.processing_key)
+            except redis.ResponseError:
+                # Нечего сбрасывать: pending-ключ ещё не создан
+                return {}
+        return {int(k): int(v) for k, v in self.client.hgetall(self.processing_key).items()}
+
+    def ack(self):
+        self.client.delete(self.processing_key)
+
+    def restore(self, counts):
+        # processing-ключ остаётся в Redis и будет подхвачен следующим сбросом
+        pass
+
+
+_buffer = None
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        if settings.EVENT_VIEWS_BUFFER == 'redis':
+            _buffer = RedisViewBuffer(settings.EVENT_VIEWS_REDIS_URL)
+        else:
+            _buffer = LocalViewBuffer()
+    return _buffer
+
+
+def record_view(event_id):
+    buffer = get_buffer()
+    try:
+        buffer.add(event_id)
+    except redis.RedisError as e:
+        logger.warning(f"Не удалось учесть просмотр события {event_id}: {e}")
+        return
+    if buffer.inline_flush and buffer.is_due(settings.EVENT_VIEWS_FLUSH_INTERVAL):
+        flush_views()
+
+
+def write_counts(counts, batch_size=None):
+    batch_size = batch_size or settings.EVENT_VIEWS_FLUSH_BATCH_SIZE
+    items = sorted(counts.items())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        # Один UPDATE ... SET views_count = views_count + CASE ... на пачку
+        Event.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+            views_count=F('views_count') + Case(
+                *[When(pk=pk, then=Value(amount)) for pk, amount in batch],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+
+
+def flush_views(batch_size=None):
+    buffer = get_buffer()
+    counts = buffer.pop()
+    if not counts:
+        return 0
+    try:
+        write_counts(counts, batch_size)
+    except Exception:
+        buffer.restore(counts)
+        raise
+    buffer.ack()
+    return sum(counts.values())
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import ArchiveFacet, Event
+
+
+def archive_key(event, now=None):
+    """Ячейка фасета для события или None, если оно не в архиве."""
+    now = now or timezone.now()
+    if event.status != Event.Status.PUBLISHED or not event.start_datetime or event.start_datetime >= now:
+        return None
+    start = timezone.localtime(event.start_datetime)
+    return start.year, start.month, event.category_id
+
+
+def month_range(year, month=None):
+    """Границы [начало, конец) года или месяца в текущем часовом поясе."""
+    tz = timezone.get_current_timezone()
+    if month:
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    else:
+        start = datetime(year, 1, 1)
+        end = datetime(year + 1, 1, 1)
+    return timezone.make_aware(start, tz), timezone.make_aware(end, tz)
+
+
+def bump(key, delta):
+    year, month, category_id = key
+    facets = ArchiveFacet.objects.filter(year=year, month=month, category_id=category_id)
+    if delta < 0:
+        # Устаревшая ячейка (до ночного пересчёта) не должна уйти в минус
+        facets.filter(count__gte=-delta).update(count=F('count') + delta)
+        return
+    if facets.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ArchiveFacet.objects.create(year=year, month=month, category_id=category_id, count=delta)
+    except IntegrityError:
+        facets.update(count=F('count') + delta)
+
+
+def sync_event(event, deleted=False):
+    old_key = getattr(event, '_archive_key', None)
+    new_key = None if deleted else archive_key(event)
+    if old_key != new_key:
+        if old_key:
+            bump(old_key, -1)
+        if new_key:
+            bump(new_key, 1)
+    event._archive_key = new_key
+
+
+def rebuild(now=None):
+    now = now or timezone.now()
+    rows = (
+        Event.objects
+        .filter(status=Event.Status.PUBLISHED, start_datetime__lt=now)
+        .annotate(year=ExtractYear('start_datetime'), month=ExtractMonth('start_datetime'))
+        .values('year', 'month', 'category_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    facets = [
+        ArchiveFacet(year=row['year'], month=row['month'], category_id=row['category_id'], count=row['total'])
+        for row in rows
+    ]
+    with transaction.atomic():
+        ArchiveFacet.objects.all().delete()
+        ArchiveFacet.objects.bulk_create(facets)
+    return len(facets)
+
+
+def navigation(year=None, month=None):
+    """
+    Данные для навигации по архиву: годы с месяцами и счётчиками,
+    а также категории выбранного периода. Читает только таблицу фасетов.
+    """
+    years = {}
+    months = ArchiveFacet.objects.values('year', 'month').annotate(total=Sum('count')).filter(total__gt=0)
+    for row in months.order_by('-year', '-month'):
+        entry = years.setdefault(row['year'], {'year': row['year'], 'total': 0, 'months': []})
+        entry['total'] += row['total']
+        entry['months'].append({'month': row['month'], 'total': row['total']})
+
+    categories = ArchiveFacet.objects.filter(count__gt=0)
+    if year:
+        categories = categories.filter(year=year)
+    if month:
+        categories = categories.filter(month=month)
+    categories = (
+        categories.values('category__name', 'category__slug')
+        .annotate(total=Sum('count'))
+        .order_by('category__name')
+    )
+    return list(years.values()), list(categories)
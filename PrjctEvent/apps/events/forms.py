@@ -40,21 +40,15 @@ class EventForm(forms.ModelForm):
                 tag.name for tag in self.instance.tags.all()
             )
 
-    def save(self, commit=True):
-        instance = super().save(commit=False)
-        if commit:
-            instance.save()
-            self.save_m2m()
-        
-        # Обработка новых тегов из tag_list
+    def _save_m2m(self):
+        # Теги из tag_list добавляются к отмеченным и сохраняются одним tags.set()
+        # вместе с остальными m2m — в том числе при save(commit=False) + save_m2m()
         tag_list = self.cleaned_data.get('tag_list', '')
         if tag_list:
-            tag_names = [name.strip() for name in tag_list.split(',') if name.strip()]
-            for tag_name in tag_names:
-                tag, created = Tag.objects.get_or_create(name=tag_name)
-                instance.tags.add(tag)
-        
-        return instance
+            tags = list(self.cleaned_data.get('tags') or [])
+            tags += Tag.resolve(tag_list.split(','))
+            self.cleaned_data['tags'] = list({tag.pk: tag for tag in tags}.values())
+        super()._save_m2m()
 
 
 class ReviewForm(forms.ModelForm):
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+STATS_KEYS = {'hit': 'fragment-stats:hits', 'miss': 'fragment-stats:misses'}
+
+
+def get_cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def _generation_key(scope):
+    return f'fragment-gen:{scope}'
+
+
+def get_generations(scopes):
+    """
+    Поколение области (scope) — метка времени последней инвалидации.
+    Смена поколения делает все ключи с ним недостижимыми, поэтому
+    удалять сами фрагменты не нужно: они вытесняются по TTL.
+    """
+    cache = get_cache()
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate(*scopes):
+    get_cache().set_many({_generation_key(scope): time.time_ns() for scope in scopes}, None)
+
+
+def make_key(template, params, scopes=(), version=None):
+    raw = json.dumps([template, version, get_generations(scopes), sorted(params.items())], default=str)
+    return f'fragment:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def lookup(key):
+    content = get_cache().get(key)
+    _count('hit' if content is not None else 'miss')
+    return content
+
+
+def store(key, content):
+    get_cache().set(key, content)
+
+
+def _count(kind):
+    # Счётчики приблизительные: файловый кэш не гарантирует атомарный incr
+    cache = get_cache()
+    try:
+        cache.incr(STATS_KEYS[kind])
+    except ValueError:
+        cache.add(STATS_KEYS[kind], 1, None)
+
+
+def get_stats():
+    values = get_cache().get_many(STATS_KEYS.values())
+    hits = values.get(STATS_KEYS['hit'], 0)
+    misses = values.get(STATS_KEYS['miss'], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 3) if total else None,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many(STATS_KEYS.values())
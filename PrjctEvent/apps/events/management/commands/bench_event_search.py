@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.test import RequestFactory
+from django.utils import timezone
+from datetime import timedelta
+
+from apps.events import search
+from apps.events.models import Event
+from apps.events.views import EventList
+
+
+WORDS = [
+    'концерт', 'джаз', 'рок', 'выставка', 'лекция', 'мастер', 'класс', 'фестиваль',
+    'театр', 'кино', 'музыка', 'искусство', 'наука', 'спорт', 'марафон', 'квиз',
+    'conference', 'meetup', 'python', 'django', 'workshop', 'startup', 'design', 'party',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку поиска EventList: icontains против полнотекстового индекса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        search.install()
+        queries = ['джаз', 'конц', 'python django', 'фестиваль музыка', 'xyz']
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.populate(size, options['batch_size'])
+                    self.report(size, queries, options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def populate(self, size, batch_size):
+        author = get_user_model().objects.create_user(email=f'bench-{time.time()}@example.com', password=None)
+        start = timezone.now() + timedelta(days=1)
+        rng = random.Random(size)
+        created = 0
+        while created < size:
+            batch = []
+            for i in range(created, min(created + batch_size, size)):
+                title = ' '.join(rng.choices(WORDS, k=3)).capitalize()
+                short = ' '.join(rng.choices(WORDS, k=8))
+                description = ' '.join(rng.choices(WORDS, k=40))
+                batch.append(Event(
+                    title=title,
+                    slug=f'bench-{i}',
+                    short_description=short,
+                    description=description,
+                    author=author,
+                    status=Event.Status.PUBLISHED,
+                    start_datetime=start + timedelta(minutes=i),
+                    search_document='\n'.join([title, short, description]),
+                ))
+            Event.objects.bulk_create(batch)
+            created += len(batch)
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), max(timings)
+
+    def report(self, size, queries, repeat):
+        factory = RequestFactory()
+        self.stdout.write(f'\n{size} событий')
+        for query in queries:
+            request = factory.get('/events/', {'q': query})
+            request.user = AnonymousUser()
+            view = EventList()
+            view.setup(request)
+
+            def run_fts():
+                qs = view.get_queryset()
+                list(qs[:view.paginate_by])
+                qs.count()
+
+            def run_legacy():
+                qs = Event.objects.filter(status='PUBLISHED', start_datetime__gte=timezone.now()).filter(
+                    Q(title__icontains=query) | Q(description__icontains=query)
+                ).order_by('start_datetime')
+                list(qs[:view.paginate_by])
+                qs.count()
+
+            legacy = self.measure(run_legacy, repeat)
+            fts = self.measure(run_fts, repeat)
+            self.stdout.write(
+                f'  {query!r:22} icontains: {legacy[0]:8.2f} ms (max {legacy[1]:8.2f})'
+                f'   fts: {fts[0]:8.2f} ms (max {fts[1]:8.2f})'
+            )
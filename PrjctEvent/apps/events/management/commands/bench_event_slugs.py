@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from apps.events.models import Event
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_slug(title):
+    base_slug = slugify(title) or 'event'
+    slug = base_slug
+    counter = 1
+    while Event.objects.filter(slug=slug).exists():
+        slug = f"{base_slug}-{counter}"
+        counter += 1
+    return slug
+
+
+class Command(BaseCommand):
+    help = 'Замеряет создание N событий с одинаковым заголовком: перебор слагов против allocate_slug'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument('--title', default='Concert')
+
+    def handle(self, *args, **options):
+        for name, create in (('legacy', self.create_legacy), ('allocate_slug', self.create_current)):
+            try:
+                with transaction.atomic():
+                    author = get_user_model().objects.create_user(email=f'bench-{time.time()}@example.com', password=None)
+                    queries = []
+                    with connection.execute_wrapper(lambda execute, sql, *a: queries.append(sql) or execute(sql, *a)):
+                        started = time.perf_counter()
+                        for _ in range(options['count']):
+                            create(options['title'], author)
+                        elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{name:14} {options["count"]} событий: {elapsed:7.2f} s, '
+                        f'запросов: {len(queries)}, '
+                        f'{elapsed / options["count"] * 1000:.2f} ms на событие'
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def create_legacy(self, title, author):
+        Event.objects.create(title=title, slug=legacy_slug(title), description='-', short_description='-', author=author)
+
+    def create_current(self, title, author):
+        Event.objects.create(title=title, description='-', short_description='-', author=author)
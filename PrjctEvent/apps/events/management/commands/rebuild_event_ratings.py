@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.events.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает агрегаты рейтинга событий по одобренным отзывам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано событий: {total}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.events import search
+from apps.events.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы событий и полнотекстовый индекс'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        search.install()
+        search.reindex_events(Event.objects.all(), batch_size=options['batch_size'])
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано событий: {Event.objects.count()}'))
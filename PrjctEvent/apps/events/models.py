@@ -1,10 +1,11 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
-from django.utils.text import slugify
+from .slugs import save_with_unique_slug, allocate_slugs
 from django.urls import reverse
-from django.db.models import Avg
+from django.db import transaction
 
 
 class Category(models.Model):
@@ -22,7 +23,7 @@ class Category(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            return save_with_unique_slug(self, self.name, super().save, *args, **kwargs)
         return super().save(*args, **kwargs)
 
 
@@ -40,9 +41,50 @@ class Tag(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            return save_with_unique_slug(self, self.name, super().save, *args, **kwargs)
         return super().save(*args, **kwargs)
 
+    @staticmethod
+    def normalize_names(names):
+        max_length = Tag._meta.get_field('name').max_length
+        result, seen = [], set()
+        for name in names:
+            name = ' '.join(name.split())[:max_length].strip()
+            if name and name.lower() not in seen:
+                seen.add(name.lower())
+                result.append(name)
+        return result
+
+    @classmethod
+    def resolve(cls, names):
+        """
+        Возвращает теги по списку имён (без учёта регистра), создавая
+        недостающие одним bulk_create. Порядок соответствует names.
+        """
+        names = cls.normalize_names(names)
+        if not names:
+            return []
+
+        lookup = Q()
+        for name in names:
+            lookup |= Q(name__iexact=name)
+        tags = {tag.name.lower(): tag for tag in cls.objects.filter(lookup)}
+
+        missing = [name for name in names if name.lower() not in tags]
+        if missing:
+            slugs = allocate_slugs(cls, missing)
+            cls.objects.bulk_create(
+                [cls(name=name, slug=slug) for name, slug in zip(missing, slugs)],
+                ignore_conflicts=True,
+            )
+            tags.update({tag.name.lower(): tag for tag in cls.objects.filter(name__in=missing)})
+            for name in missing:
+                # Слаг успел занять параллельный запрос — создаём по одному через Tag.save
+                if name.lower() not in tags:
+                    tags[name.lower()] = cls.objects.get_or_create(name=name)[0]
+
+        return [tags[name.lower()] for name in names]
+
 
 class Event(models.Model):
     class Status(models.TextChoices):
@@ -83,11 +125,26 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.PositiveIntegerField(_('Просмотры'), default=0)
+    search_document = models.TextField(_('Поисковый документ'), blank=True, default='', editable=False)
+
+    # Агрегаты одобренных отзывов, обновляются инкрементально в Review.save/delete
+    rating_count = models.PositiveIntegerField(_('Количество оценок'), default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(_('Сумма оценок'), default=0, editable=False)
+    rating_avg = models.FloatField(_('Средний рейтинг'), null=True, blank=True, editable=False)
+    rating_1 = models.PositiveIntegerField(_('Оценок «1»'), default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(_('Оценок «2»'), default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(_('Оценок «3»'), default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(_('Оценок «4»'), default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(_('Оценок «5»'), default=0, editable=False)
 
     class Meta:
         verbose_name = _('Событие')
         verbose_name_plural = _('События')
         ordering = ['-start_datetime']
+        indexes = [
+            # Курсорная пагинация EventList/EventArchive по (start_datetime, id)
+            models.Index(fields=['status', 'start_datetime', 'id'], name='event_status_start_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -95,26 +152,52 @@ class Event(models.Model):
     def get_absolute_url(self):
         return reverse('events:event_detail', kwargs={'slug': self.slug})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем, в какой ячейке архивных фасетов событие уже учтено
+        if {'status', 'start_datetime', 'category_id'} <= set(field_names):
+            from .facets import archive_key
+            instance._archive_key = archive_key(instance)
+        return instance
+
     def average_rating(self):
-        try:
-            agg = self.reviews.filter(approved=True).aggregate(avg=Avg('rating'))
-            return round(agg['avg'], 1) if agg['avg'] else None
-        except Exception:
-            return None
+        return round(self.rating_avg, 1) if self.rating_count else None
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}') for star in range(1, 6)}
 
     def save(self, *args, **kwargs):
-        if not self.slug or self.slug == '':
-            base_slug = slugify(self.title)
-            if not base_slug:
-                base_slug = 'event'
+        if not self.slug:
+            return save_with_unique_slug(self, self.title, super().save, *args, fallback='event', **kwargs)
+        super().save(*args, **kwargs)
 
-            self.slug = base_slug
 
-            counter = 1
-            while Event.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
-                self.slug = f"{base_slug}-{counter}"
-                counter += 1
-        super().save(*args, **kwargs)
+class ArchiveFacet(models.Model):
+    """Количество прошедших опубликованных событий по году, месяцу и категории."""
+    year = models.PositiveSmallIntegerField(_('Год'))
+    month = models.PositiveSmallIntegerField(_('Месяц'))
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='archive_facets',
+        verbose_name=_('Категория'),
+        null=True,
+        blank=True
+    )
+    count = models.PositiveIntegerField(_('Количество событий'), default=0)
+
+    class Meta:
+        verbose_name = _('Фасет архива')
+        verbose_name_plural = _('Фасеты архива')
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'category'], name='unique_archive_facet'),
+        ]
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02d} {self.category or "-"}: {self.count}'
 
 
 class Review(models.Model):
@@ -153,3 +236,49 @@ class Review(models.Model):
 
     def __str__(self):
         return f'{self.user} - {self.event} ({self.rating})'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем, какая оценка уже учтена в агрегатах события
+        if 'rating' in field_names and 'approved' in field_names:
+            instance._counted_rating = instance.rating if instance.approved else None
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .ratings import apply_rating_change
+
+        counted = getattr(self, '_counted_rating', None)
+        current = self.rating if self.approved else None
+        with transaction.atomic():
+            if self._state.adding:
+                super().save(*args, **kwargs)
+                if current is not None:
+                    apply_rating_change(self.event_id, None, current)
+            else:
+                while counted != current:
+                    # Переход учтённой оценки — условный UPDATE: из одновременных
+                    # одобрений одного отзыва агрегаты изменит только одно
+                    lookup = {'approved': False} if counted is None else {'approved': True, 'rating': counted}
+                    claimed = Review.objects.filter(pk=self.pk, **lookup).update(
+                        approved=self.approved, rating=self.rating
+                    )
+                    if claimed:
+                        apply_rating_change(self.event_id, counted, current)
+                        break
+                    # Строку уже изменил другой запрос — считаем от учтённого им состояния
+                    row = Review.objects.filter(pk=self.pk).values('approved', 'rating').first()
+                    if row is None:
+                        break
+                    counted = row['rating'] if row['approved'] else None
+                super().save(*args, **kwargs)
+        self._counted_rating = current
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Учтённая оценка берётся из заблокированной строки, вычитает её post_delete
+            row = Review.objects.select_for_update().filter(pk=self.pk).values('approved', 'rating').first()
+            if row is None:
+                return 0, {}
+            self._counted_rating = row['rating'] if row['approved'] else None
+            return super().delete(*args, **kwargs)
@@ -0,0 +1,79 @@
+from django.core import signing
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPaginationMixin:
+    """
+    Курсорная пагинация по (cursor_field, id) для ListView.
+
+    Включается параметром ?cursor= (пустое значение — первая страница).
+    Вместо OFFSET и COUNT(*) выбирается page_size + 1 строк после курсора,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+    cursor_param = 'cursor'
+    cursor_field = 'start_datetime'
+    cursor_descending = False
+    cursor_salt = 'events.pagination.cursor'
+
+    next_cursor = None
+    prev_cursor = None
+
+    def use_cursor(self):
+        return self.cursor_param in self.request.GET
+
+    def encode_cursor(self, obj, backwards=False):
+        value = getattr(obj, self.cursor_field)
+        return signing.dumps([value.isoformat(), obj.pk, backwards], salt=self.cursor_salt)
+
+    def decode_cursor(self, token):
+        try:
+            value, pk, backwards = signing.loads(token, salt=self.cursor_salt)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise Http404('Неверный курсор.')
+        value = parse_datetime(value)
+        if value is None:
+            raise Http404('Неверный курсор.')
+        return value, pk, backwards
+
+    def get_cursor_ordering(self, backwards):
+        descending = self.cursor_descending != backwards
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.cursor_field}', f'{prefix}id']
+
+    def seek(self, queryset, value, pk, backwards):
+        lookup = 'lt' if self.cursor_descending != backwards else 'gt'
+        return queryset.filter(
+            Q(**{f'{self.cursor_field}__{lookup}': value})
+            | Q(**{self.cursor_field: value, f'id__{lookup}': pk})
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor():
+            return super().paginate_queryset(queryset, page_size)
+
+        token = self.request.GET.get(self.cursor_param)
+        backwards = False
+        if token:
+            value, pk, backwards = self.decode_cursor(token)
+            queryset = self.seek(queryset, value, pk, backwards)
+
+        rows = list(queryset.order_by(*self.get_cursor_ordering(backwards))[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        has_next = bool(token) if backwards else has_more
+        has_prev = has_more if backwards else bool(token)
+        self.next_cursor = self.encode_cursor(rows[-1]) if rows and has_next else None
+        self.prev_cursor = self.encode_cursor(rows[0], backwards=True) if rows and has_prev else None
+        return None, None, rows, False
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['cursor_mode'] = self.use_cursor()
+        ctx['next_cursor'] = self.next_cursor
+        ctx['prev_cursor'] = self.prev_cursor
+        return ctx
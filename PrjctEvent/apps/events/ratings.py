@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, FloatField, Value
+from django.db.models.functions import Cast, NullIf
+
+from . import fragment_cache
+from .models import Event, Review
+
+
+STARS = range(1, 6)
+
+
+def apply_rating_change(event_id, old_rating=None, new_rating=None):
+    """
+    Инкрементально обновляет агрегаты события одним UPDATE.
+    old_rating — оценка, которая была учтена (None — не была),
+    new_rating — оценка, которую нужно учесть (None — убрать).
+    """
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    updates = {
+        'rating_count': F('rating_count') + count_delta,
+        'rating_sum': F('rating_sum') + sum_delta,
+        # Правые части UPDATE вычисляются по старым значениям строки
+        'rating_avg': Cast(F('rating_sum') + sum_delta, FloatField()) / NullIf(
+            F('rating_count') + count_delta, Value(0)
+        ),
+    }
+    if old_rating is not None:
+        updates[f'rating_{old_rating}'] = F(f'rating_{old_rating}') - 1
+    if new_rating is not None:
+        updates[f'rating_{new_rating}'] = F(f'rating_{new_rating}') + 1
+    Event.objects.filter(pk=event_id).update(**updates)
+
+
+def rebuild_ratings(queryset=None, batch_size=1000):
+    queryset = Event.objects.all() if queryset is None else queryset
+    event_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    fields = ['rating_count', 'rating_sum', 'rating_avg'] + [f'rating_{star}' for star in STARS]
+
+    for start in range(0, len(event_ids), batch_size):
+        batch_ids = event_ids[start:start + batch_size]
+        histograms = defaultdict(dict)
+        rows = Review.objects.filter(approved=True, event_id__in=batch_ids).values(
+            'event_id', 'rating'
+        ).annotate(total=Count('id')).order_by()
+        for row in rows:
+            histograms[row['event_id']][row['rating']] = row['total']
+
+        events = []
+        for event_id in batch_ids:
+            histogram = histograms.get(event_id, {})
+            event = Event(pk=event_id)
+            event.rating_count = sum(histogram.values())
+            event.rating_sum = sum(star * total for star, total in histogram.items())
+            event.rating_avg = event.rating_sum / event.rating_count if event.rating_count else None
+            for star in STARS:
+                setattr(event, f'rating_{star}', histogram.get(star, 0))
+            events.append(event)
+        Event.objects.bulk_update(events, fields)
+        # bulk_update не шлёт сигналов: сбрасываем кэш карточек с отзывами и рейтингом
+        fragment_cache.invalidate('events', *(f'event:{event_id}' for event_id in batch_ids))
+    return len(event_ids)
@@ -0,0 +1,150 @@
+import re
+
+from django.db import connections, router
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Event
+
+
+FTS_TABLE = f'{Event._meta.db_table}_fts'
+GIN_INDEX = f'{Event._meta.db_table}_search_gin'
+TS_CONFIG = 'simple'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_document(event, tag_names=None):
+    parts = [event.title, event.short_description, event.description]
+    if event.category_id:
+        parts.append(event.category.name)
+    if tag_names is None and event.pk:
+        tag_names = event.tags.values_list('name', flat=True)
+    parts.extend(tag_names or [])
+    return '\n'.join(part for part in parts if part)
+
+
+def index_event(event):
+    document = build_document(event)
+    if document != event.search_document:
+        Event.objects.filter(pk=event.pk).update(search_document=document)
+        event.search_document = document
+
+
+def reindex_events(queryset, batch_size=500):
+    queryset = queryset.select_related('category').prefetch_related('tags').order_by('pk')
+    changed = []
+    for event in queryset.iterator(chunk_size=batch_size):
+        document = build_document(event, [tag.name for tag in event.tags.all()])
+        if document != event.search_document:
+            event.search_document = document
+            changed.append(event)
+        if len(changed) >= batch_size:
+            Event.objects.bulk_update(changed, ['search_document'])
+            changed = []
+    if changed:
+        Event.objects.bulk_update(changed, ['search_document'])
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def _vendor(queryset):
+    return connections[queryset.db].vendor
+
+
+def search(queryset, query):
+    """
+    Фильтрует queryset событий по полнотекстовому запросу и добавляет
+    аннотацию search_rank (чем больше, тем релевантнее).
+    Каждое слово запроса ищется по префиксу.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+
+    vendor = _vendor(queryset)
+    table = Event._meta.db_table
+
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        # Соединение с FTS-таблицей: bm25() доступен только в контексте MATCH
+        # и возвращает отрицательные значения (лучшие совпадения меньше нуля)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-bm25({FTS_TABLE})'},
+        )
+
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        vector = f"to_tsvector('{TS_CONFIG}', {table}.search_document)"
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT id FROM {table} "
+                f"WHERE to_tsvector('{TS_CONFIG}', search_document) @@ to_tsquery('{TS_CONFIG}', %s)",
+                [tsquery],
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({vector}, to_tsquery('{TS_CONFIG}', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+    condition = Q()
+    for token in tokens:
+        condition &= Q(search_document__icontains=token)
+    return queryset.filter(condition).annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+
+
+def install(using='default'):
+    connection = connections[using]
+    table = Event._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"search_document, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            # Внешний контент: FTS-индекс синхронизируется триггерами
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); "
+                f"END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) "
+                f"VALUES ('delete', old.id, old.search_document); "
+                f"END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_document ON {table} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) "
+                f"VALUES ('delete', old.id, old.search_document); "
+                f"INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document); "
+                f"END"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON {table} "
+                f"USING gin (to_tsvector('{TS_CONFIG}', search_document))"
+            )
+
+
+def rebuild(using='default'):
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def install_on_migrate(sender, using='default', **kwargs):
+    if router.allow_migrate_model(using, Event) and Event._meta.db_table in connections[using].introspection.table_names():
+        install(using)
@@ -0,0 +1,70 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import search, fragment_cache, facets, ratings
+from .models import Event, Tag, Category, Review
+
+
+@receiver(post_save, sender=Event)
+def index_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_event(instance)
+
+
+@receiver(m2m_changed, sender=Event.tags.through)
+def index_event_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_event(instance)
+        return
+
+    # instance — тег, pk_set — id событий (при clear pk_set пустой)
+    if action == 'pre_clear':
+        instance._cleared_event_ids = list(instance.events.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        search.reindex_events(Event.objects.filter(pk__in=getattr(instance, '_cleared_event_ids', [])))
+    elif action in ('post_add', 'post_remove'):
+        search.reindex_events(Event.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Category)
+def reindex_related_events(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.reindex_events(instance.events.all())
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fragment_cache.invalidate('events', f'event:{instance.pk}')
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender='tickets.Ticket')
+@receiver(post_delete, sender='tickets.Ticket')
+def invalidate_related_event_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fragment_cache.invalidate('events', f'event:{instance.event_id}')
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review_rating(sender, instance, origin=None, **kwargs):
+    # Срабатывает и при каскадном удалении (пользователя, queryset.delete), минуя Review.delete
+    counted = getattr(instance, '_counted_rating', None)
+    if counted is not None and not isinstance(origin, Event):
+        ratings.apply_rating_change(instance.event_id, counted, None)
+    instance._counted_rating = None
+
+
+@receiver(post_save, sender=Event)
+def sync_archive_facets(sender, instance, raw=False, **kwargs):
+    if not raw:
+        facets.sync_event(instance)
+
+
+@receiver(post_delete, sender=Event)
+def remove_from_archive_facets(sender, instance, **kwargs):
+    facets.sync_event(instance, deleted=True)
@@ -0,0 +1,134 @@
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+
+def _base_slug(model, source, field, fallback):
+    max_length = model._meta.get_field(field).max_length
+    return slugify(source)[:max_length].strip('-') or fallback or model._meta.model_name
+
+
+# Больше цифр в суффиксе на практике не бывает; длиннее N проверит уникальный индекс
+MAX_SUFFIX_DIGITS = 10
+
+
+def _stem(base, digits, max_length):
+    """Основа слага с суффиксом из digits цифр: длинный base обрезается под суффикс."""
+    return base[:max_length - digits - 1].rstrip('-')
+
+
+def _with_suffix(base, counter, max_length):
+    return f'{_stem(base, len(str(counter)), max_length)}-{counter}'
+
+
+def _suffix_stems(bases, max_length):
+    """{(основа, число цифр N): {base, ...}} — как выглядят base-N после обрезки."""
+    stems = {}
+    for base in bases:
+        for digits in range(1, MAX_SUFFIX_DIGITS + 1):
+            stems.setdefault((_stem(base, digits, max_length), digits), set()).add(base)
+    return stems
+
+
+def _suffix_regex(bases, max_length):
+    """
+    Регулярка для занятых base-N. Пока base не обрезается, это base-[0-9]+;
+    у длинного base для каждой длины N своя основа, поэтому и своя ветка.
+    """
+    widths = {}
+    for stem, digits in _suffix_stems(bases, max_length):
+        widths.setdefault(stem, set()).add(digits)
+    alternatives = sorted(
+        f'{re.escape(stem)}-[0-9]+' if len(digits) == MAX_SUFFIX_DIGITS
+        else '|'.join(f'{re.escape(stem)}-[0-9]{{{width}}}' for width in sorted(digits))
+        for stem, digits in widths.items()
+    )
+    return '^(%s)$' % '|'.join(alternatives)
+
+
+def allocate_slug(instance, source, field='slug', fallback=None):
+    """
+    Подбирает свободный слаг одним запросом: среди занятых base и base-N
+    берётся наибольший N. Если base не обрезается под суффикс, это самый
+    длинный слаг (затем лексикографически); для длинного base основа зависит
+    от длины N, и максимум ищется среди всех совпадений.
+    """
+    model = type(instance)
+    max_length = model._meta.get_field(field).max_length
+    base = _base_slug(model, source, field, fallback)
+
+    taken = (
+        model._default_manager
+        .filter(Q(**{field: base}) | Q(**{
+            f'{field}__startswith': _stem(base, MAX_SUFFIX_DIGITS, max_length),
+            f'{field}__regex': _suffix_regex([base], max_length),
+        }))
+        .exclude(pk=instance.pk)
+    )
+    if len(base) + 1 + MAX_SUFFIX_DIGITS <= max_length:
+        taken = taken.annotate(slug_length=Length(field)).order_by('-slug_length', f'-{field}')[:1]
+    taken = list(taken.values_list(field, flat=True))
+    if not taken:
+        return base
+
+    counter = max((int(slug.rsplit('-', 1)[1]) for slug in taken if slug != base), default=0) + 1
+    return _with_suffix(base, counter, max_length)
+
+
+def allocate_slugs(model, sources, field='slug', fallback=None):
+    """
+    Пакетный вариант allocate_slug для bulk_create: занятые слаги всех
+    базовых вариантов читаются одним запросом, совпадения внутри пакета
+    тоже получают суффиксы.
+    """
+    max_length = model._meta.get_field(field).max_length
+    bases = [_base_slug(model, source, field, fallback) for source in sources]
+    if not bases:
+        return []
+
+    stems = _suffix_stems(set(bases), max_length)
+    taken = set(
+        model._default_manager
+        .filter(Q(**{f'{field}__in': set(bases)}) | Q(**{f'{field}__regex': _suffix_regex(set(bases), max_length)}))
+        .values_list(field, flat=True)
+    )
+
+    counters = {}
+    for slug in taken:
+        stem, _, number = slug.rpartition('-')
+        if not number.isdigit():
+            continue
+        for base in stems.get((stem, len(number)), ()):
+            counters[base] = max(counters.get(base, 1), int(number) + 1)
+
+    slugs = []
+    for base in bases:
+        slug = base
+        while slug in taken:
+            counter = counters.get(base, 1)
+            counters[base] = counter + 1
+            slug = _with_suffix(base, counter, max_length)
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def save_with_unique_slug(instance, source, save, *args, field='slug', fallback=None, attempts=5, **kwargs):
+    """
+    Сохраняет объект со свежевыделенным слагом. При гонке двух одновременных
+    созданий уникальный индекс отклонит одно из них — тогда слаг подбирается заново.
+    """
+    model = type(instance)
+    for attempt in range(attempts):
+        setattr(instance, field, allocate_slug(instance, source, field=field, fallback=fallback))
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            slug = getattr(instance, field)
+            collided = model._default_manager.filter(**{field: slug}).exclude(pk=instance.pk).exists()
+            if not collided or attempt == attempts - 1:
+                raise
@@ -0,0 +1,37 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from .counters import get_buffer, flush_views
+from . import facets
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_event_views():
+    buffer = get_buffer()
+    if buffer.inline_flush:
+        # Локальный буфер живёт в веб-процессе, воркеру сбрасывать нечего
+        return 0
+    lock = buffer.lock(timeout=settings.EVENT_VIEWS_FLUSH_INTERVAL * 2)
+    if not lock.acquire():
+        logger.info("flush_event_views: предыдущий сброс ещё выполняется")
+        return 0
+    try:
+        flushed = flush_views()
+    finally:
+        lock.release()
+    logger.info(f"flush_event_views: записано просмотров: {flushed}")
+    return flushed
+
+
+@shared_task
+def rebuild_archive_facets():
+    # События переходят в архив с течением времени, без сохранения — их
+    # подхватывает ночной пересчёт
+    total = facets.rebuild()
+    logger.info(f"rebuild_archive_facets: ячеек фасетов: {total}")
+    return total
@@ -1,3 +1,219 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.chat.buffer import save_messages
+from apps.chat.models import ChatMessage
+from apps.tickets.models import Ticket
+from config.profiling import QueryBudgetExceeded
+from . import fragment_cache
+from .admin import ReviewAdmin
+from .views import EventDetail, EventList
+from .models import Category, Event, Review, Tag
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(email='author@example.com', password=None)
+
+    def create_event(self, title):
+        return Event.objects.create(title=title, description='-', short_description='-', author=self.author)
+
+    def test_duplicate_titles_get_numbered_slugs(self):
+        slugs = [self.create_event('Митап').slug for _ in range(3)]
+        self.assertEqual(len(set(slugs)), 3)
+
+    def test_max_length_title_keeps_counting_after_truncation(self):
+        # Суффикс отрезает хвост base: a…a-1 уже не начинается с полного base
+        slugs = [self.create_event('a' * 100).slug for _ in range(12)]
+        self.assertEqual(len(set(slugs)), 12)
+        self.assertEqual(slugs[2], 'a' * 98 + '-2')
+        self.assertEqual(slugs[11], 'a' * 97 + '-11')
+        self.assertTrue(all(len(slug) <= 100 for slug in slugs))
+
+    def test_bulk_tags_with_max_length_names(self):
+        # Имена различаются только пунктуацией, слаг у всех — b…b длиной 49 из 50
+        names = ['b' * 49 + mark for mark in '!?.,;']
+        tags = Tag.resolve(names[:2]) + Tag.resolve(names[2:])
+        self.assertEqual(len({tag.slug for tag in tags}), 5)
+        self.assertIn('b' * 48 + '-3', {tag.slug for tag in tags})
+
+
+class ReviewAdminActionTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        author = users.create_user(email='organizer@example.com', password=None)
+        self.event = Event.objects.create(title='Концерт', description='-', short_description='-', author=author)
+        for index, rating in enumerate((4, 2)):
+            user = users.create_user(email=f'guest{index}@example.com', password=None)
+            Review.objects.create(user=user, event=self.event, rating=rating)
+        self.model_admin = ReviewAdmin(Review, admin.site)
+
+    def test_approve_on_changelist_filtered_by_approved(self):
+        self.model_admin.approve_reviews(None, Review.objects.filter(approved=False))
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.rating_count, self.event.rating_avg), (2, 3.0))
+
+        self.model_admin.reject_reviews(None, Review.objects.filter(approved=True))
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.rating_count, self.event.rating_avg), (0, None))
+
+
+# Тесты не должны писать в файловый кэш фрагментов в BASE_DIR/cache
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragment-tests'},
+})
+class EventFragmentInvalidationTests(TestCase):
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(email='host@example.com', password=None)
+        self.event = Event.objects.create(title='Лекция', description='-', short_description='-', author=self.author)
+        self.ticket = Ticket.objects.create(event=self.event, quantity_available=10)
+
+    def test_ticket_counter_updates(self):
+        for write in (lambda: self.ticket.sell(2), lambda: self.ticket.hold(1), lambda: self.ticket.sell_held(1)):
+            listing, card = fragment_cache.get_generations(['events', f'event:{self.event.pk}'])
+            write()
+            # Меняется только карточка события, кэш списка событий остаётся
+            self.assertEqual(fragment_cache.get_generations(['events', f'event:{self.event.pk}'])[0], listing)
+            self.assertNotEqual(fragment_cache.get_generations([f'event:{self.event.pk}'])[0], card)
+
+    def test_buffered_chat_messages(self):
+        before = fragment_cache.get_generations([f'event:{self.event.pk}'])
+        save_messages([ChatMessage(event=self.event, user=self.author, message='Привет')], 100)
+        self.assertNotEqual(fragment_cache.get_generations([f'event:{self.event.pk}']), before)
+
+
+class ReviewRatingAggregateTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        author = users.create_user(email='stage@example.com', password=None)
+        self.guest = users.create_user(email='listener@example.com', password=None)
+        self.event = Event.objects.create(title='Опера', description='-', short_description='-', author=author)
+        self.review = Review.objects.create(user=self.guest, event=self.event, rating=4)
+
+    def assertRating(self, count, total):
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.rating_count, self.event.rating_sum), (count, total))
+
+    def test_concurrent_approvals_count_once(self):
+        # Оба модератора загрузили отзыв до одобрения
+        first, second = Review.objects.get(pk=self.review.pk), Review.objects.get(pk=self.review.pk)
+        first.approved = second.approved = True
+        first.save()
+        second.save()
+        self.assertRating(1, 4)
+
+    def test_stale_instance_applies_delta_from_stored_state(self):
+        stale = Review.objects.get(pk=self.review.pk)
+        self.review.approved = True
+        self.review.save()
+        stale.approved, stale.rating = True, 2
+        stale.save()
+        self.assertRating(1, 2)
+
+    def test_repeated_delete_counts_once(self):
+        self.review.approved = True
+        self.review.save()
+        copy = Review.objects.get(pk=self.review.pk)
+        self.review.delete()
+        copy.delete()
+        self.assertRating(0, 0)
+
+    def test_cascade_from_user_delete(self):
+        self.review.approved = True
+        self.review.save()
+        self.guest.delete()
+        self.assertRating(0, 0)
+
+
+EVENT_LIST_TEMPLATE = (
+    '{% for category in categories %}{{ category.name }}{% endfor %}'
+    '{% for event in events %}{{ event.title }}{% endfor %}{{ events_count }}{{ no_events }}'
+)
+
+
+@override_settings(TEMPLATES=[{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+        'events/event_list.html': EVENT_LIST_TEMPLATE,
+        'events/partials/event_list.html': EVENT_LIST_TEMPLATE,
+    })]},
+}])
+class EventListQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(email='lister@example.com', password=None)
+        cls.category = Category.objects.create(name='Музыка')
+        start = timezone.now() + timedelta(days=1)
+        for index in range(15):
+            Event.objects.create(
+                title=f'Концерт {index}', description='-', short_description='-', author=author,
+                category=cls.category, status=Event.Status.PUBLISHED, start_datetime=start,
+            )
+
+    def test_without_filters(self):
+        # COUNT для пагинатора, страница событий, категории
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('events:event_list'))
+        self.assertEqual(response.context['events_count'], 15)
+
+    def test_with_filters(self):
+        # Категория ищется один раз, плюс те же три запроса
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse('events:event_list_category', kwargs={'category_slug': self.category.slug}),
+                {'status': Event.Status.PUBLISHED, 'page': 2},
+            )
+        self.assertEqual(len(response.context['events']), 5)
+
+    def test_search(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('events:event_list'), {'q': 'Концерт'})
+        self.assertFalse(response.context['no_events'])
+
+
+@override_settings(
+    TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+            'events/event_list.html': EVENT_LIST_TEMPLATE,
+            'events/event_detail.html': (
+                '{{ event.title }}{% for ticket in tickets %}{{ ticket.available_count }}{% endfor %}'
+                '{% for review in reviews %}{{ review.rating }}{% endfor %}'
+                '{% for message in chat_messages %}{{ message.user.email }}{% endfor %}'
+            ),
+        })]},
+    }],
+    PROFILING_ENABLED=True,
+    PROFILING_RAISE_ON_BUDGET=True,
+    EVENT_VIEWS_BUFFER='local',
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(email='budget@example.com', password=None)
+        cls.event = Event.objects.create(
+            title='Фестиваль', description='-', short_description='-', author=author,
+            status=Event.Status.PUBLISHED, start_datetime=timezone.now() + timedelta(days=1),
+        )
+        cls.user = author
+
+    def test_hot_views_fit_their_budgets(self):
+        self.client.force_login(self.user)
+        for url in (reverse('events:event_list'), self.event.get_absolute_url()):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('queries', response['Server-Timing'])
+
+    def test_exceeded_budget_fails_the_request(self):
+        for view, url in ((EventList, reverse('events:event_list')), (EventDetail, self.event.get_absolute_url())):
+            with self.subTest(view=view.__name__), mock.patch.object(view, 'query_budget', 1):
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.client.get(url)
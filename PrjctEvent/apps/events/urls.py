@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (
     EventList, EventDetail, EventCreate, EventUpdate, EventDelete,
     EventArchive, ReviewCreate, ReviewUpdate, ReviewDelete,
-    ReviewList, ApproveReviewView, RejectReviewView
+    ReviewList, ApproveReviewView, RejectReviewView, FragmentCacheStats
 )
 
 app_name = 'events'
@@ -11,6 +11,7 @@ urlpatterns = [
     path('', EventList.as_view(), name='event_list'),
     path('create/', EventCreate.as_view(), name='event_create'),
     path('archive/', EventArchive.as_view(), name='event_archive'),
+    path('fragment-cache/stats/', FragmentCacheStats.as_view(), name='fragment_cache_stats'),
     
     path('reviews/', ReviewList.as_view(), name='review_list'),
     path('reviews/<int:pk>/update/', ReviewUpdate.as_view(), name='review_update'),
@@ -4,15 +4,20 @@ from django.template.response import TemplateResponse
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import redirect, get_object_or_404
 from django.db.models import Q
-from django.utils.text import slugify
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.urls import reverse
 from django.utils import timezone
 
 from .forms import EventForm, ReviewForm, EventSearchForm
 from .models import Event, Review, Category
+from . import search
+from .pagination import KeysetPaginationMixin
+from .counters import record_view
+from . import fragment_cache, facets
 from apps.chat.models import ChatMessage
+from apps.chat.views import encode_cursor
+from config.profiling import query_budget
 
 def htmx_redirect(request, url):
     if request.headers.get('HX-Request'):
@@ -24,30 +29,80 @@ def htmx_redirect(request, url):
 class HTMXMixin:
     partial_template = None
     full_template = None
+    # GET-параметры, от которых зависит фрагмент; None — кэширование выключено
+    fragment_cache_params = None
+    fragment_cache_scopes = ()
     
     def render_response(self, context):
         template = self.partial_template if self.request.headers.get('HX-Request') else self.full_template
         return TemplateResponse(self.request, template, context)
 
-class EventList(HTMXMixin, ListView):
+    def get_fragment_cache_scopes(self):
+        return self.fragment_cache_scopes
+
+    def get_fragment_cache_version(self):
+        return None
+
+    def get_fragment_cache_key(self):
+        # Кэшируются только HTMX-фрагменты для анонимов: у них одинаковое содержимое
+        if self.fragment_cache_params is None or not self.request.headers.get('HX-Request'):
+            return None
+        if self.request.user.is_authenticated:
+            return None
+        params = {name: self.request.GET.get(name) for name in self.fragment_cache_params}
+        params.update(self.kwargs)
+        return fragment_cache.make_key(
+            self.partial_template, params, self.get_fragment_cache_scopes(), self.get_fragment_cache_version()
+        )
+
+    def render_cached_response(self, get_context):
+        key = self.get_fragment_cache_key()
+        if key is None:
+            return self.render_response(get_context())
+
+        content = fragment_cache.lookup(key)
+        if content is not None:
+            response = HttpResponse(content)
+            response['X-Fragment-Cache'] = 'hit'
+            return response
+
+        def store(response):
+            # Фрагмент с CSRF-токеном привязан к cookie конкретного клиента
+            if not self.request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                fragment_cache.store(key, response.content)
+
+        response = self.render_response(get_context())
+        response.add_post_render_callback(store)
+        response['X-Fragment-Cache'] = 'miss'
+        return response
+
+@query_budget(8)
+class EventList(HTMXMixin, KeysetPaginationMixin, ListView):
     partial_template = 'events/partials/event_list.html'
     full_template = 'events/event_list.html'
     paginate_by = 10
     context_object_name = 'events'
+    filtered_queryset = None
+    fragment_cache_params = ('q', 'status', 'page', 'cursor')
+    fragment_cache_scopes = ('events',)
 
     def get_queryset(self):
+        # Фильтры (включая поиск категории) строятся один раз за запрос
+        if self.filtered_queryset is not None:
+            return self.filtered_queryset
+
         now = timezone.now()
         
         if self.request.user.is_authenticated:
             qs = Event.objects.filter(
                 Q(author=self.request.user) | 
                 (Q(status='PUBLISHED') & Q(start_datetime__gte=now))
-            ).order_by('start_datetime')
+            ).order_by('start_datetime', 'id')
         else:
             qs = Event.objects.filter(
                 status='PUBLISHED',
                 start_datetime__gte=now
-            ).order_by('start_datetime')
+            ).order_by('start_datetime', 'id')
         
         query = (self.request.GET.get('q') or '').strip()
         category_slug = self.kwargs.get('category_slug')
@@ -57,19 +112,31 @@ class EventList(HTMXMixin, ListView):
             category = get_object_or_404(Category, slug=category_slug)
             qs = qs.filter(category=category)
             self.current_category = category
-        if query:
-            qs = qs.filter(Q(title__icontains=query) | Q(description__icontains=query))
         if status_filter:
             qs = qs.filter(status=status_filter)
+        if query:
+            qs = search.search(qs, query).order_by('-search_rank', 'start_datetime', 'id')
         
+        self.filtered_queryset = qs
         return qs
 
+    def use_cursor(self):
+        # Результаты поиска упорядочены по релевантности, курсор по дате к ним неприменим
+        return super().use_cursor() and not (self.request.GET.get('q') or '').strip()
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx['categories'] = Category.objects.all()
         ctx['search_form'] = EventSearchForm(self.request.GET or None)
         ctx['search_query'] = self.request.GET.get('q')
-        ctx['no_events'] = not self.get_queryset().exists()
+        # paginator.count уже посчитан при пагинации, повторный запрос не нужен;
+        # в курсорном режиме COUNT(*) не выполняется вовсе
+        if ctx['paginator'] is not None:
+            ctx['events_count'] = ctx['paginator'].count
+            ctx['no_events'] = ctx['events_count'] == 0
+        else:
+            ctx['events_count'] = None
+            ctx['no_events'] = not ctx['events']
         
         if hasattr(self, 'current_category'):
             ctx['current_category'] = self.current_category
@@ -77,11 +144,14 @@ class EventList(HTMXMixin, ListView):
         return ctx
 
     def get(self, request, *args, **kwargs):
-        self.object_list = self.get_queryset()
-        context = self.get_context_data()
-        return self.render_response(context)
+        def get_context():
+            self.object_list = self.get_queryset()
+            return self.get_context_data()
+
+        return self.render_cached_response(get_context)
 
 
+@query_budget(10)
 class EventDetail(HTMXMixin, DetailView):
     model = Event
     slug_field = 'slug'
@@ -90,13 +160,32 @@ class EventDetail(HTMXMixin, DetailView):
     partial_template = 'events/partials/event_detail.html'
     full_template = 'events/event_detail.html'
 
+    fragment_cache_params = ()
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        # Просмотр копится в буфере и пишется в БД пачкой, страница остаётся read-only
+        record_view(self.object.pk)
+        return self.render_cached_response(lambda: self.get_context_data(object=self.object))
+
+    def get_fragment_cache_scopes(self):
+        return (f'event:{self.object.pk}',)
+
+    def get_fragment_cache_version(self):
+        return self.object.updated_at.isoformat()
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         event = self.object
 
-        ctx['chat_messages'] = ChatMessage.objects.filter(
+        # Последние сообщения; более ранние подгружаются из chat:chat_history по курсору
+        chat_messages = list(ChatMessage.objects.filter(
             event=event
-        ).select_related('user').order_by('timestamp')[:20]
+        ).select_related('user').order_by('-timestamp', '-id')[:20])
+        ctx['chat_messages'] = chat_messages[::-1]
+        ctx['chat_history_cursor'] = (
+            encode_cursor(chat_messages[-1]) if len(chat_messages) == 20 else None
+        )
 
         ctx['event_slug'] = event.slug
 
@@ -126,8 +215,6 @@ class EventCreate(LoginRequiredMixin, HTMXMixin, TemplateView):
             event = form.save(commit=False)
             event.author = request.user
             event.status = Event.Status.DRAFT
-            if not event.slug:
-                event.slug = slugify(event.title)
             event.save()
             form.save_m2m()
 
@@ -165,8 +252,9 @@ class EventUpdate(LoginRequiredMixin, UserPassesTestMixin, HTMXMixin, TemplateVi
         form = EventForm(request.POST, request.FILES, instance=instance, request=request)
         if form.is_valid():
             event = form.save(commit=False)
-            if form.cleaned_data['title'] != instance.title:
-                event.slug = slugify(event.title)
+            if 'title' in form.changed_data:
+                # Пустой слаг будет выделен заново в Event.save
+                event.slug = ''
             event.save()
             form.save_m2m()
 
@@ -202,40 +290,62 @@ class EventDelete(LoginRequiredMixin, UserPassesTestMixin, HTMXMixin, TemplateVi
         return htmx_redirect(request, reverse('events:event_list'))
 
 
-class EventArchive(HTMXMixin, ListView):
+class EventArchive(HTMXMixin, KeysetPaginationMixin, ListView):
     partial_template = 'events/partials/archive_list.html'
     full_template = 'events/archive.html'
     paginate_by = 10
     context_object_name = 'events'
+    cursor_descending = True
+    fragment_cache_params = ('year', 'month', 'category', 'page', 'cursor')
+    fragment_cache_scopes = ('events',)
 
     def get_queryset(self):
         now = timezone.now()
         qs = Event.objects.filter(
             status='PUBLISHED',
             start_datetime__lt=now
-        ).order_by('-start_datetime')
+        ).order_by('-start_datetime', '-id')
 
-        year = self.request.GET.get('year')
-        month = self.request.GET.get('month')
+        year = self.parse_int('year', 1970, 2999)
+        month = self.parse_int('month', 1, 12)
+        category_slug = self.request.GET.get('category')
+        # Диапазон по start_datetime использует индекс, в отличие от __year/__month
         if year:
-            qs = qs.filter(start_datetime__year=year)
-        if month:
+            start, end = facets.month_range(year, month)
+            qs = qs.filter(start_datetime__gte=start, start_datetime__lt=end)
+        elif month:
             qs = qs.filter(start_datetime__month=month)
+        if category_slug:
+            qs = qs.filter(category__slug=category_slug)
         
         self.selected_year = year
         self.selected_month = month
+        self.selected_category = category_slug
         return qs
 
+    def parse_int(self, name, minimum, maximum):
+        try:
+            value = int(self.request.GET.get(name) or 0)
+        except ValueError:
+            return None
+        return value if minimum <= value <= maximum else None
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx['selected_year'] = self.selected_year
         ctx['selected_month'] = self.selected_month
+        ctx['selected_category'] = self.selected_category
+        ctx['archive_years'], ctx['archive_categories'] = facets.navigation(
+            self.selected_year, self.selected_month
+        )
         return ctx
 
     def get(self, request, *args, **kwargs):
-        self.object_list = self.get_queryset()
-        context = self.get_context_data()
-        return self.render_response(context)
+        def get_context():
+            self.object_list = self.get_queryset()
+            return self.get_context_data()
+
+        return self.render_cached_response(get_context)
 
 
 class ReviewCreate(LoginRequiredMixin, HTMXMixin, TemplateView):
@@ -370,3 +480,11 @@ class RejectReviewView(UserPassesTestMixin, View):
         review.save()
         ctx = {'review': review, 'message': 'Rejected'}
         return TemplateResponse(request, 'events/partials/review_row.html', ctx)
+
+
+class FragmentCacheStats(UserPassesTestMixin, View):
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(fragment_cache.get_stats())
@@ -0,0 +1,38 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+import json
+
+from .counters import unread_count
+from .push import group_name
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Персональный канал уведомлений: при подключении отдаёт текущее число
+    непрочитанных, затем — новые уведомления и изменения счётчика (delta).
+    """
+
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = group_name(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        count = await database_sync_to_async(unread_count)(user)
+        await self.send(text_data=json.dumps({'type': 'unread', 'count': count}))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_created(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'notification': event['notification'],
+            'unread_delta': 1,
+        }))
+
+    async def unread_changed(self, event):
+        await self.send(text_data=json.dumps({'type': 'unread', 'delta': event['delta']}))
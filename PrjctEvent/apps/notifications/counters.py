@@ -0,0 +1,39 @@
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import Notification, UnreadCounter
+from . import push
+
+
+def increment(user_ids, amount=1):
+    user_ids = list(user_ids)
+    UnreadCounter.objects.bulk_create([UnreadCounter(user_id=pk) for pk in user_ids], ignore_conflicts=True)
+    UnreadCounter.objects.filter(user_id__in=user_ids).update(count=F('count') + amount)
+
+
+def decrement(user_id, amount=1):
+    if amount:
+        UnreadCounter.objects.filter(user_id=user_id).update(count=Greatest(F('count') - amount, Value(0)))
+        push.unread_delta(user_id, -amount)
+
+
+def unread_count(user):
+    """
+    Читает счётчик одним запросом по первичному ключу. Если строки ещё нет
+    (уведомления появились до счётчика), она заполняется подсчётом.
+    """
+    count = UnreadCounter.objects.filter(user=user).values_list('count', flat=True).first()
+    if count is None:
+        count = Notification.objects.filter(user=user, is_read=False).count()
+        count = UnreadCounter.objects.get_or_create(user=user, defaults={'count': count})[0].count
+    return count
+
+
+def rebuild(user_queryset):
+    """Пересчитывает счётчики заданных пользователей по таблице уведомлений."""
+    rows = user_queryset.annotate(unread=Count('notifications', filter=Q(notifications__is_read=False)))
+    counters = [UnreadCounter(user_id=user.pk, count=user.unread) for user in rows.only('pk')]
+    UnreadCounter.objects.bulk_create(
+        counters, update_conflicts=True, unique_fields=['user'], update_fields=['count'], batch_size=500
+    )
+    return len(counters)
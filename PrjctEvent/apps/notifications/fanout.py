@@ -0,0 +1,51 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+
+from apps.tickets.models import Registration
+from .models import Notification
+from . import counters, push
+
+
+def staff_users():
+    return get_user_model().objects.filter(is_staff=True, is_active=True)
+
+
+def event_registrants(event_id):
+    return get_user_model().objects.filter(
+        registrations__event_id=event_id,
+        registrations__status=Registration.Status.CONFIRMED,
+    )
+
+
+# Аудитории задаются именем, чтобы задача Celery получала только JSON-аргументы
+AUDIENCES = {
+    'staff': staff_users,
+    'event_registrants': event_registrants,
+}
+
+
+def audience_user_ids(audience, chunk_size, **kwargs):
+    return (
+        AUDIENCES[audience](**kwargs)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+        .distinct()
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def create_notifications(user_ids, **fields):
+    """Одна пачка уведомлений одним INSERT; возвращает объекты с id."""
+    notifications = Notification.objects.bulk_create([Notification(user_id=user_id, **fields) for user_id in user_ids])
+    # bulk_create минует post_save, поэтому счётчики и push — здесь
+    counters.increment(user_ids)
+    for notification in notifications:
+        push.notification_created(notification)
+    return notifications
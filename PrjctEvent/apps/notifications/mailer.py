@@ -0,0 +1,154 @@
+import logging
+import smtplib
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def get_shared_connection():
+    """
+    Одно SMTP-соединение на процесс (поток) воркера. Соединение открывается
+    явно, поэтому send_messages() не закрывает его после каждой пачки.
+    """
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        connection = _local.connection = get_connection(fail_silently=False)
+        connection.open()
+    return connection
+
+
+def close_shared_connection(**kwargs):
+    connection = getattr(_local, 'connection', None)
+    if connection is not None:
+        _local.connection = None
+        try:
+            connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+def send_messages(messages):
+    """Отправляет письма через общее соединение; разорванное сервером переоткрывается один раз."""
+    if not messages:
+        return 0
+    try:
+        return get_shared_connection().send_messages(messages) or 0
+    except (smtplib.SMTPServerDisconnected, ConnectionError):
+        close_shared_connection()
+        return get_shared_connection().send_messages(messages) or 0
+
+
+def send_message(message):
+    """
+    Одно письмо через общее соединение. При разрыве повторяется только оно,
+    а не уже доставленные письма пачки.
+    """
+    return send_messages([message])
+
+
+def build_message(notification):
+    return EmailMessage(
+        subject=notification.title,
+        body=notification.message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[notification.user.email],
+    )
+
+
+def send_batch(notifications):
+    """
+    Отправляет пачку уведомлений по одному письму через общее соединение и
+    отмечает is_sent только доставленные. Уведомления пользователей без e-mail
+    тоже отмечаются, иначе досылка повторяла бы их вечно; письма, отклонённые
+    сервером, получают email_failed. Если сервер недоступен, остаток пачки
+    остаётся неотправленным — его дошлёт dispatch_stale.
+    """
+    started = time.perf_counter()
+    sent, failed, interrupted = [], [], False
+    for notification in notifications:
+        if not notification.user.email:
+            sent.append(notification.pk)
+            continue
+        try:
+            send_message(build_message(notification))
+        except smtplib.SMTPException as error:
+            if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+                interrupted = True
+                break
+            logger.exception(f"Mail for notification {notification.pk} rejected")
+            failed.append(notification.pk)
+        except OSError:
+            interrupted = True
+            break
+        else:
+            sent.append(notification.pk)
+    if interrupted:
+        logger.warning(f"Mail batch interrupted after {len(sent) + len(failed)}/{len(notifications)}")
+        close_shared_connection()
+
+    Notification.objects.filter(pk__in=sent).update(is_sent=True, sent_at=timezone.now())
+    if failed:
+        Notification.objects.filter(pk__in=failed).update(email_failed=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"Mail batch: {len(sent)}/{len(notifications)} sent in {elapsed:.0f} ms")
+    return {'count': len(notifications), 'sent': len(sent), 'failed': len(failed), 'ms': round(elapsed, 1)}
+
+
+def send_notifications(notification_ids, batch_size=None):
+    batch_size = batch_size or settings.NOTIFICATION_EMAIL_BATCH_SIZE
+    pending = (
+        Notification.objects
+        .filter(pk__in=notification_ids, is_sent=False, email_failed=False)
+        .select_related('user')
+        .order_by('pk')
+    )
+    batch, stats = [], []
+    for notification in pending.iterator(chunk_size=batch_size):
+        batch.append(notification)
+        if len(batch) == batch_size:
+            stats.append(send_batch(batch))
+            batch = []
+    if batch:
+        stats.append(send_batch(batch))
+    return stats
+
+
+def dispatch_stale(batch_size=None):
+    """
+    Досылает уведомления, письмо по которым не ушло (упала задача или воркер).
+    Берутся только достаточно старые, чтобы не пересечься с обычной отправкой,
+    и не старше NOTIFICATION_EMAIL_SWEEP_MAX_AGE: накопившийся хвост (например,
+    строки, созданные до появления is_sent) не превращается в массовую рассылку.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.NOTIFICATION_EMAIL_RETRY_AFTER)
+    oldest = now - timedelta(seconds=settings.NOTIFICATION_EMAIL_SWEEP_MAX_AGE)
+    ids = list(
+        Notification.objects
+        .filter(is_sent=False, email_failed=False, created_at__lte=cutoff, created_at__gte=oldest)
+        .order_by('pk')
+        .values_list('pk', flat=True)[:settings.NOTIFICATION_EMAIL_SWEEP_LIMIT]
+    )
+    return send_notifications(ids, batch_size)
+
+
+def mark_existing_sent(before=None):
+    """
+    Отмечает отправленными уведомления, созданные до появления is_sent:
+    письма по ним уже ушли прежним путём. Запускается один раз после миграции.
+    """
+    return Notification.objects.filter(is_sent=False, created_at__lt=before or timezone.now()).update(
+        is_sent=True, sent_at=F('created_at')
+    )
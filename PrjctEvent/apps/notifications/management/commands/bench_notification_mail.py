@@ -0,0 +1,72 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from apps.notifications import mailer
+from apps.notifications.models import Notification
+from apps.notifications.smtp_sink import SMTPSink
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет отправку N писем-уведомлений через локальный отладочный SMTP-сервер: '
+        'send_mail на каждое письмо против пачек через общее соединение'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        for name, send in (('send_mail', self.send_each), ('mailer', self.send_batched)):
+            sink = SMTPSink().start()
+            host, port = sink.server_address
+            try:
+                with override_settings(
+                    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                    EMAIL_HOST=host, EMAIL_PORT=port, EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+                    EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+                ), transaction.atomic():
+                    ids = self.create_notifications(options['count'])
+                    started = time.perf_counter()
+                    send(ids, options['batch_size'])
+                    elapsed = time.perf_counter() - started
+                    unsent = Notification.objects.filter(pk__in=ids, is_sent=False).count()
+                    raise Rollback
+            except Rollback:
+                pass
+            finally:
+                mailer.close_shared_connection()
+                sink.stop()
+            self.stdout.write(
+                f'{name:10} {options["count"]} писем: {elapsed:6.2f} s, '
+                f'SMTP-соединений: {sink.stats["connections"]}, принято: {sink.stats["messages"]}, '
+                f'не отмечено is_sent: {unsent}'
+            )
+
+    def create_notifications(self, count):
+        User = get_user_model()
+        run = time.time_ns()
+        users = User.objects.bulk_create([User(email=f'mail-{run}-{i}@example.com') for i in range(count)])
+        notifications = Notification.objects.bulk_create([
+            Notification(user=user, title='Бенчмарк', message='Проверка рассылки') for user in users
+        ])
+        return [notification.pk for notification in notifications]
+
+    def send_each(self, ids, batch_size):
+        # Прежняя задача: отдельный запрос пользователя и новое соединение на письмо
+        for pk in ids:
+            notification = Notification.objects.get(pk=pk)
+            send_mail(notification.title, notification.message, None, [notification.user.email])
+            Notification.objects.filter(pk=pk).update(is_sent=True)
+
+    def send_batched(self, ids, batch_size):
+        mailer.send_notifications(ids, batch_size=batch_size)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from apps.notifications.mailer import mark_existing_sent
+
+
+class Command(BaseCommand):
+    help = (
+        'Отмечает отправленными (sent_at = created_at) уведомления без is_sent, созданные до --before '
+        '(по умолчанию — до текущего момента). Запустить один раз после миграции, добавившей is_sent, '
+        'чтобы досылка не повторила письма, ушедшие раньше.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Граница created_at (ISO 8601)')
+
+    def handle(self, *args, **options):
+        before = None
+        if options['before']:
+            before = parse_datetime(options['before'])
+            if before is None:
+                raise CommandError('Неверный формат --before.')
+        total = mark_existing_sent(before)
+        self.stdout.write(self.style.SUCCESS(f'Отмечено уведомлений: {total}'))
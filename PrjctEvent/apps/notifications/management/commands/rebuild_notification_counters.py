@@ -0,0 +1,12 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.notifications.counters import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики непрочитанных уведомлений пользователей'
+
+    def handle(self, *args, **options):
+        total = rebuild(get_user_model().objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано пользователей: {total}'))
@@ -18,15 +18,40 @@ class Notification(models.Model):
     event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True)
     review = models.ForeignKey(Review, on_delete=models.SET_NULL, null=True, blank=True)
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES, default='EVENT')
+    is_sent = models.BooleanField(default=False)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Сервер отклонил письмо (например, адрес получателя): досылка его не повторяет
+    email_failed = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-created_at']
-        indexes = [models.Index(fields=['user', 'is_read'])]
+        indexes = [
+            models.Index(fields=['user', 'is_read']),
+            models.Index(fields=['is_sent', 'created_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.user.username})"
 
     def mark_as_read(self):
+        from .counters import decrement
+
         if not self.is_read:
             self.is_read = True
-            self.save(update_fields=['is_read'])
+            # Условный UPDATE: при двойном клике счётчик уменьшится один раз
+            if Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True):
+                decrement(self.user_id)
+
+
+class UnreadCounter(models.Model):
+    """Денормализованный счётчик непрочитанных уведомлений пользователя."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter',
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user}: {self.count}"
@@ -0,0 +1,45 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def group_name(user_id):
+    return f'notifications_{user_id}'
+
+
+def serialize(notification):
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'event_id': notification.event_id,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def _send(user_id, message):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    try:
+        async_to_sync(layer.group_send)(group_name(user_id), message)
+    except Exception as e:
+        # Доставка в реальном времени необязательна: уведомление уже в БД
+        logger.warning(f"Notification push to user {user_id} failed: {e}")
+
+
+def notification_created(notification):
+    """Отправляет новое уведомление в WebSocket пользователя после коммита."""
+    message = {'type': 'notification.created', 'notification': serialize(notification)}
+    transaction.on_commit(lambda: _send(notification.user_id, message))
+
+
+def unread_delta(user_id, delta):
+    if delta:
+        transaction.on_commit(lambda: _send(user_id, {'type': 'unread.changed', 'delta': delta}))
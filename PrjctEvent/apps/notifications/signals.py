@@ -1,26 +1,22 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.auth import get_user_model
 
 from .models import Notification
-from .tasks import send_notification_email
-
-User = get_user_model()
+from . import counters, push
+from .tasks import send_notification_email, fan_out_notifications
 
 
 @receiver(post_save, sender='events.Event')
 def create_event_notification(sender, instance, created, **kwargs):
     if created:
-        admins = User.objects.filter(is_staff=True)
-        for admin_user in admins:
-            notification = Notification.objects.create(
-                user=admin_user,
-                title=f"Новое событие: {instance.title}",
-                message=f"Создано событие '{instance.title}' пользователем {instance.author}.",
-                event=instance,
-                notification_type='EVENT'
-            )
-            send_notification_email.delay(notification.id)
+        # Уведомления администраторам создаёт задача: в запросе — одна постановка в очередь
+        title = f"Новое событие: {instance.title}"
+        message = f"Создано событие '{instance.title}' пользователем {instance.author}."
+        event_id = instance.id
+        transaction.on_commit(
+            lambda: fan_out_notifications.delay('staff', title, message, 'EVENT', event_id=event_id)
+        )
 
 @receiver(post_save, sender='events.Review')
 def create_review_notification(sender, instance, created, **kwargs):
@@ -32,4 +28,18 @@ def create_review_notification(sender, instance, created, **kwargs):
             review=instance,
             notification_type='REVIEW'
         )
-        send_notification_email.delay(notification.id)
+        # Письмо ставится в очередь после коммита, как и рассылка о новом событии
+        transaction.on_commit(lambda: send_notification_email.delay(notification.id))
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        counters.increment([instance.user_id])
+        push.notification_created(instance)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_unread_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        counters.decrement(instance.user_id)
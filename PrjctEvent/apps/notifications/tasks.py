@@ -1,18 +1,49 @@
 from celery import shared_task
-from django.core.mail import send_mail
-from .models import Notification
+from django.conf import settings
+from . import fanout, mailer
+
 
 @shared_task
 def send_notification_email(notification_id):
-    try:
-        notification = Notification.objects.get(id=notification_id)
-        send_mail(
-            subject=notification.title,
-            message=notification.message,
-            from_email=None,
-            recipient_list=[notification.user.email],
-            fail_silently=False,
+    return mailer.send_notifications([notification_id])
+
+
+@shared_task
+def send_notification_emails(notification_ids):
+    return mailer.send_notifications(notification_ids)
+
+
+@shared_task
+def dispatch_stale_notification_emails():
+    return mailer.dispatch_stale()
+
+
+@shared_task
+def fan_out_notifications(audience, title, message, notification_type, event_id=None, review_id=None,
+                          audience_kwargs=None):
+    """
+    Рассылка уведомлений аудитории (см. fanout.AUDIENCES): bulk_create пачками
+    по NOTIFICATION_FANOUT_CHUNK_SIZE и одна задача писем на пачку.
+    """
+    chunk_size = settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+    total = 0
+    user_ids = fanout.audience_user_ids(audience, chunk_size, **(audience_kwargs or {}))
+    for chunk in fanout.chunks(user_ids, chunk_size):
+        notifications = fanout.create_notifications(
+            chunk,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            event_id=event_id,
+            review_id=review_id,
         )
-        print(f'Email sent for notification {notification_id}')
-    except Notification.DoesNotExist as e:
-        print(f'Error in task: {e}')
+        send_notification_emails.delay([notification.id for notification in notifications])
+        total += len(notifications)
+    return total
+
+
+def notify_event_registrants(event, title, message, notification_type='REMINDER'):
+    fan_out_notifications.delay(
+        'event_registrants', title, message, notification_type,
+        event_id=event.id, audience_kwargs={'event_id': event.id},
+    )
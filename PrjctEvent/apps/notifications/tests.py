@@ -1,3 +1,175 @@
-from django.test import TestCase
+import smtplib
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.template import engines
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.events.models import Event, Review
+from . import mailer
+from .consumers import NotificationConsumer
+from .models import Notification
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='reader@example.com', password=None)
+        for i in range(3):
+            Notification.objects.create(user=self.user, title=f'N{i}', message='-')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def render(self, source):
+        return engines['django'].from_string(source).render({}, self.request)
+
+    def test_page_without_badge_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            self.render('<p>{{ request.path }}</p>')
+
+    def test_badge_reads_counter_once(self):
+        with self.assertNumQueries(1):
+            html = self.render('{% if unread_notifications %}{{ unread_notifications }}{% endif %}')
+        self.assertEqual(html, '3')
+
+    def test_counter_follows_read_state(self):
+        Notification.objects.filter(user=self.user).first().mark_as_read()
+        self.assertEqual(self.render('{{ unread_notifications }}'), '2')
+        self.client.force_login(self.user)
+        self.client.post('/notifications/read/all/', HTTP_HX_REQUEST='true')
+        self.assertEqual(self.render('{{ unread_notifications }}'), '0')
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ReviewNotificationTests(TestCase):
+    def test_email_is_queued_after_commit(self):
+        users = get_user_model().objects
+        author = users.create_user(email='organizer@example.com', password=None)
+        guest = users.create_user(email='guest@example.com', password=None)
+        event = Event.objects.create(title='Лекция', description='-', short_description='-', author=author)
+        with mock.patch('apps.notifications.signals.send_notification_email.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                Review.objects.create(user=guest, event=event, rating=5)
+                delay.assert_not_called()
+        notification = Notification.objects.get(user=author, notification_type='REVIEW')
+        delay.assert_called_once_with(notification.id)
+
+
+class NotificationConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='listener@example.com', password=None)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notifications/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_anonymous_is_rejected(self):
+        communicator, connected = await self.connect(AnonymousUser())
+        self.assertFalse(connected)
+
+    async def test_pushes_notifications_and_unread_deltas(self):
+        communicator, connected = await self.connect(self.user)
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unread', 'count': 0})
+
+        notification = await database_sync_to_async(Notification.objects.create)(
+            user=self.user, title='Привет', message='-'
+        )
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'notification')
+        self.assertEqual(message['notification']['id'], notification.id)
+        self.assertEqual(message['unread_delta'], 1)
+
+        await database_sync_to_async(notification.mark_as_read)()
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unread', 'delta': -1})
+        await communicator.disconnect()
+
+
+class StaleNotificationSweepTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='sweep@example.com', password=None)
+
+    def create(self, age):
+        notification = Notification.objects.create(user=self.user, title='N', message='-')
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - age)
+        return notification
+
+    def test_sweep_skips_notifications_older_than_max_age(self):
+        historical = self.create(timedelta(days=30))
+        stale = self.create(timedelta(hours=1))
+        mailer.dispatch_stale()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(Notification.objects.get(pk=historical.pk).is_sent)
+        self.assertTrue(Notification.objects.get(pk=stale.pk).is_sent)
+
+    def test_mark_existing_sent_uses_created_at(self):
+        historical = self.create(timedelta(days=30))
+        self.assertEqual(mailer.mark_existing_sent(), 1)
+        historical.refresh_from_db()
+        self.assertTrue(historical.is_sent)
+        self.assertEqual(historical.sent_at, historical.created_at)
+        mailer.dispatch_stale()
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class FlakySMTPConnection:
+    """Подменяет SMTP: refused — отклонённые адреса, drop_at — номер письма, на котором сервер недоступен."""
+
+    def __init__(self, refused=(), drop_at=None):
+        self.refused = set(refused)
+        self.drop_at = drop_at
+        self.delivered = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.drop_at is not None and len(self.delivered) >= self.drop_at:
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            if message.to[0] in self.refused:
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+            self.delivered.append(message.to[0])
+        return len(messages)
+
+    def close(self):
+        pass
+
+
+class MailBatchTests(TestCase):
+    def setUp(self):
+        users = get_user_model().objects
+        self.ids = [
+            Notification.objects.create(
+                user=users.create_user(email=f'mail{index}@example.com', password=None), title='N', message='-'
+            ).pk
+            for index in range(3)
+        ]
+
+    def send(self, connection):
+        with mock.patch.object(mailer, 'get_shared_connection', return_value=connection):
+            return mailer.send_notifications(self.ids)
+
+    def test_refused_recipient_is_marked_failed(self):
+        connection = FlakySMTPConnection(refused=['mail1@example.com'])
+        self.send(connection)
+        self.assertEqual(connection.delivered, ['mail0@example.com', 'mail2@example.com'])
+        failed = Notification.objects.get(pk=self.ids[1])
+        self.assertEqual((failed.is_sent, failed.email_failed), (False, True))
+        self.assertEqual(Notification.objects.filter(is_sent=True).count(), 2)
+
+        retry = FlakySMTPConnection()
+        self.send(retry)
+        self.assertEqual(retry.delivered, [])
+
+    def test_disconnect_keeps_delivered_messages_sent(self):
+        self.send(FlakySMTPConnection(drop_at=1))
+        self.assertEqual(list(Notification.objects.filter(is_sent=True).values_list('pk', flat=True)), self.ids[:1])
+
+        retry = FlakySMTPConnection()
+        self.send(retry)
+        self.assertEqual(retry.delivered, ['mail1@example.com', 'mail2@example.com'])
@@ -9,6 +9,7 @@ from django.urls import reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .forms import NotificationFilterForm
 from .models import Notification
+from . import counters
 
 
 class NotificationList(LoginRequiredMixin, ListView):
@@ -58,7 +59,8 @@ class NotificationMarkReadView(LoginRequiredMixin, View):
     
 class NotificationMarkAllReadView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        marked = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        counters.decrement(request.user.pk, marked)
 
         messages.success(request, 'Все уведомления помечены как прочитанные.')
         if request.headers.get('HX-Request'):
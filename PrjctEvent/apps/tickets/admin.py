@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Ticket, Registration
+from .models import Ticket, Registration, TicketHold, StripeEvent, RevenueEntry
+from .webhooks import replay
 
 
 class TicketInline(admin.TabularInline):
@@ -22,5 +23,52 @@ class RegistrationAdmin(admin.ModelAdmin):
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
-    list_display = ['event', 'type', 'price', 'quantity_available', 'sold_count']
+    list_display = ['event', 'type', 'price', 'quantity_available', 'sold_count', 'held_count']
     list_filter = ['event', 'type']
+
+
+@admin.register(TicketHold)
+class TicketHoldAdmin(admin.ModelAdmin):
+    list_display = ['registration', 'ticket', 'quantity', 'expires_at']
+    list_select_related = ['registration__user', 'registration__event', 'ticket__event']
+    readonly_fields = ['registration', 'ticket', 'quantity', 'expires_at']
+
+    # Резервы меняют счётчик held_count, поэтому правятся только через Registration
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'type', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'type']
+    search_fields = ['event_id']
+    readonly_fields = ['event_id', 'type', 'payload', 'attempts', 'error', 'received_at', 'processed_at']
+    actions = ['replay_events']
+
+    def replay_events(self, request, queryset):
+        processed = replay(queryset)
+        self.message_user(request, f"Повторно обработано событий: {processed}.")
+    replay_events.short_description = "Обработать повторно"
+
+
+@admin.register(RevenueEntry)
+class RevenueEntryAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'event', 'organizer', 'kind', 'quantity', 'amount']
+    list_filter = ['kind']
+    list_select_related = ['event', 'organizer']
+    search_fields = ['event__title', 'organizer__email']
+    date_hierarchy = 'created_at'
+
+    # Журнал только дополняется из Registration.confirm()/cancel()
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
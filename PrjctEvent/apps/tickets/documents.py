@@ -0,0 +1,134 @@
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, engines
+from django.template.loader import get_template
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+
+from .models import Registration
+
+
+# Используется, если в проекте нет шаблона settings.TICKET_PDF_TEMPLATE
+DEFAULT_TEMPLATE = '''
+<html>
+<body>
+  <h1>Билет на {{ event.title }}</h1>
+  <table>
+    <tr><th>Дата</th><td>{{ event.start_datetime|date:"d.m.Y H:i" }}</td></tr>
+    {% if event.location %}<tr><th>Место</th><td>{{ event.location }}</td></tr>{% endif %}
+    <tr><th>Участник</th><td>{{ user.get_full_name|default:user.email }}</td></tr>
+    <tr><th>Тип</th><td>{% if ticket %}{{ ticket.get_type_display }}{% else %}Бесплатно{% endif %}</td></tr>
+    <tr><th>Количество</th><td>{{ registration.quantity }}</td></tr>
+    <tr><th>Номер</th><td>{{ registration.id }}</td></tr>
+  </table>
+</body>
+</html>
+'''
+
+STYLESHEET = '''
+@page { size: A5 landscape; margin: 12mm; }
+body { font-family: sans-serif; font-size: 11pt; }
+h1 { font-size: 18pt; margin: 0 0 8mm; }
+th { text-align: left; padding-right: 6mm; color: #555; }
+'''
+
+
+class TicketRenderer:
+    """
+    Генератор PDF на процесс воркера: шаблон, таблица стилей и FontConfiguration
+    (поиск и загрузка шрифтов — самая дорогая часть запуска WeasyPrint)
+    создаются один раз и переиспользуются для всех билетов.
+    """
+
+    def __init__(self):
+        try:
+            self.template = get_template(settings.TICKET_PDF_TEMPLATE)
+        except TemplateDoesNotExist:
+            self.template = engines['django'].from_string(DEFAULT_TEMPLATE)
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(string=STYLESHEET, font_config=self.font_config)
+
+    def context(self, registration):
+        return {
+            'registration': registration,
+            'event': registration.event,
+            'ticket': registration.ticket,
+            'user': registration.user,
+        }
+
+    def render_html(self, registration):
+        return self.template.render(self.context(registration))
+
+    def render_pdf(self, html):
+        return HTML(string=html).write_pdf(stylesheets=[self.stylesheet], font_config=self.font_config)
+
+    def warm_up(self):
+        self.render_pdf('<p>warm-up</p>')
+
+
+_local = threading.local()
+
+
+def get_renderer():
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = _local.renderer = TicketRenderer()
+    return renderer
+
+
+def warm_up(**kwargs):
+    # Подключается к worker_process_init: первый билет не платит за загрузку шрифтов
+    get_renderer().warm_up()
+
+
+def cache_path(registration_id, version):
+    return Path(settings.TICKET_PDF_CACHE_DIR) / f'{registration_id}-{version}.pdf'
+
+
+def get_ticket_pdf(registration, renderer=None):
+    """
+    Возвращает PDF билета из дискового кэша по (registration_id, version).
+    Версия — хэш отрендеренного HTML и TICKET_PDF_VERSION, поэтому любое
+    изменение данных билета или шаблона само даёт новый файл.
+    """
+    renderer = renderer or get_renderer()
+    html = renderer.render_html(registration)
+    digest = hashlib.md5(f'{settings.TICKET_PDF_VERSION}:{html}'.encode()).hexdigest()[:16]
+    path = cache_path(registration.id, digest)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    pdf = renderer.render_pdf(html)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Запись через временный файл: параллельный воркер не прочитает недописанный PDF
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    for stale in path.parent.glob(f'{registration.id}-*.pdf'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return pdf
+
+
+def render_event_tickets(event_id, statuses=(Registration.Status.CONFIRMED,)):
+    """Пакетная генерация билетов события одним генератором; возвращает число билетов."""
+    renderer = get_renderer()
+    registrations = (
+        Registration.objects
+        .filter(event_id=event_id, status__in=statuses)
+        .select_related('event', 'ticket', 'user')
+        .order_by('pk')
+    )
+    count = 0
+    for registration in registrations.iterator(chunk_size=200):
+        get_ticket_pdf(registration, renderer)
+        count += 1
+    return count
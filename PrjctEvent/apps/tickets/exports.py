@@ -0,0 +1,177 @@
+import csv
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Registration, Ticket
+
+
+COLUMNS = [
+    ('ID', 'pk'),
+    ('Событие', 'event__title'),
+    ('E-mail', 'user__email'),
+    ('Имя', 'user__first_name'),
+    ('Фамилия', 'user__last_name'),
+    ('Тип билета', 'ticket__type'),
+    ('Количество', 'quantity'),
+    ('Статус', 'status'),
+    ('Сумма', 'total_amount'),
+    ('Дата', 'purchase_date'),
+]
+
+# Ячейку с таким началом Excel и LibreOffice считают формулой (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def registrations(events=None, status=None):
+    queryset = Registration.objects.all()
+    if events is not None:
+        queryset = queryset.filter(event__in=events)
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset.order_by('pk')
+
+
+def csv_text(value):
+    """
+    Ячейка CSV: апостроф в начале не даёт открыть текст как формулу.
+    В XLSX строки пишутся как inlineStr и формулами не считаются, там
+    апостроф остался бы в ячейке как есть.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def rows(queryset):
+    """
+    Строки выгрузки: values_list без создания моделей, iterator() читает
+    пачками по REGISTRATION_EXPORT_CHUNK_SIZE (на PostgreSQL — серверным
+    курсором), поэтому память не растёт с размером выгрузки.
+    """
+    # Подписи и часовой пояс — один раз на выгрузку, а не на каждую строку
+    ticket_types = {value: str(label) for value, label in Ticket.TicketType.choices}
+    statuses = {value: str(label) for value, label in Registration.Status.choices}
+    tz = timezone.get_current_timezone()
+    values = queryset.values_list(*[field for _, field in COLUMNS])
+    for row in values.iterator(chunk_size=settings.REGISTRATION_EXPORT_CHUNK_SIZE):
+        pk, event, email, first_name, last_name, ticket_type, quantity, status, amount, date = row
+        yield [
+            pk, event, email, first_name, last_name,
+            ticket_types.get(ticket_type, 'Бесплатно'),
+            quantity, statuses.get(status, status), amount,
+            date.astimezone(tz).strftime('%Y-%m-%d %H:%M'),
+        ]
+
+
+class Echo:
+    """Псевдофайл для csv.writer: write() возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    # BOM — чтобы Excel открыл UTF-8 с кириллицей
+    yield '\ufeff' + writer.writerow([title for title, _ in COLUMNS])
+    for row in rows:
+        yield writer.writerow([csv_text(value) for value in row])
+
+
+class ZipStream:
+    """Неперематываемый файл для ZipFile: записанное забирает генератор."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Регистрации" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c t="n"><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value or ""))}</t></is></c>'
+
+
+def xlsx_row(values):
+    return '<row>' + ''.join(xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(rows):
+    """
+    Минимальный XLSX без сторонних библиотек: лист с inline-строками пишется
+    в ZIP потоком (ZipFile поддерживает неперематываемый вывод), в памяти
+    только текущая пачка сжатых данных.
+    """
+    output = ZipStream()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield output.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + xlsx_row([title for title, _ in COLUMNS])
+            ).encode())
+            for row in rows:
+                sheet.write(xlsx_row(row).encode())
+                if output.chunks:
+                    yield output.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield output.drain()
@@ -0,0 +1,127 @@
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+# Локальная замена Stripe API для тестов и нагрузочных замеров: понимает
+# создание и получение Checkout Session, Idempotency-Key, а также умеет
+# добавлять задержку и случайные 5xx, чтобы проверить таймауты и повторы.
+
+
+def _unflatten(pairs):
+    # metadata[registration_id]=1 -> {'metadata': {'registration_id': '1'}}
+    data = {}
+    for key, value in pairs:
+        parts = key.replace(']', '').split('[')
+        node = data
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return data
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate_network(self):
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.failure_rate:
+            self.server.failures += 1
+            self.send_json(500, {'error': {'type': 'api_error', 'message': 'Fake Stripe failure'}})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = _unflatten(parse_qsl(self.rfile.read(length).decode()))
+        if not self.simulate_network():
+            return
+        if self.path != '/v1/checkout/sessions':
+            self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+            return
+
+        key = self.headers.get('Idempotency-Key')
+        with self.server.lock:
+            session_id = self.server.idempotency.get(key)
+            if session_id is None:
+                session_id = f'cs_test_{uuid.uuid4().hex}'
+                self.server.sessions[session_id] = {
+                    'id': session_id,
+                    'object': 'checkout.session',
+                    'url': f'{self.server.base_url}/pay/{session_id}',
+                    'status': 'open',
+                    'payment_status': 'unpaid',
+                    'payment_intent': f'pi_test_{uuid.uuid4().hex}',
+                    'mode': params.get('mode'),
+                    'metadata': params.get('metadata', {}),
+                    'expires_at': int(params.get('expires_at') or 0),
+                    'success_url': params.get('success_url'),
+                    'cancel_url': params.get('cancel_url'),
+                }
+                if key:
+                    self.server.idempotency[key] = session_id
+            session = self.server.sessions[session_id]
+        self.send_json(200, session)
+
+    def do_GET(self):
+        if not self.simulate_network():
+            return
+        prefix = '/v1/checkout/sessions/'
+        session = self.server.sessions.get(self.path[len(prefix):]) if self.path.startswith(prefix) else None
+        if session is None:
+            self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout.session'}})
+            return
+        self.send_json(200, session)
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, failure_rate=0.0):
+        super().__init__(address, FakeStripeHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.idempotency = {}
+        self.requests = 0
+        self.failures = 0
+
+    def handle_error(self, request, client_address):
+        # Клиент не дождался ответа (таймаут): для сервера с задержкой это штатно
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -51,7 +51,7 @@ class TicketForm(forms.ModelForm):
             raise ValidationError(_('Доступное количество не может быть отрицательным.'))
         
         if self.instance.pk:
-            available = self.instance.quantity_available - self.instance.sold_count
+            available = self.instance.available_count
             if qty_purchase > available:
                 raise ValidationError(_('Недостаточно билетов: доступно %(avail)s') % {'avail': available})
 
@@ -0,0 +1,50 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Registration, Ticket, TicketHold
+
+
+def release_expired(batch_size=None):
+    """
+    Удаляет брошенные оформления: PENDING-регистрации с истёкшим резервом.
+    Регистрации блокируются первыми (как в confirm/cancel), а занятые
+    параллельным подтверждением пропускаются через SKIP LOCKED.
+    """
+    batch_size = batch_size or settings.TICKET_HOLD_BATCH_SIZE
+    released = 0
+    while True:
+        with transaction.atomic():
+            registration_ids = list(
+                Registration.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .filter(status=Registration.Status.PENDING, hold__expires_at__lte=timezone.now())
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not registration_ids:
+                return released
+
+            held = Counter()
+            for ticket_id, quantity in TicketHold.objects.filter(
+                registration_id__in=registration_ids
+            ).values_list('ticket_id', 'quantity'):
+                held[ticket_id] += quantity
+
+            # Один UPDATE ... SET held_count = held_count - CASE ... на пачку
+            Ticket.objects.filter(pk__in=held).update(
+                held_count=F('held_count') - Case(
+                    *[When(pk=pk, then=Value(quantity)) for pk, quantity in held.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            # Как и при ошибке Stripe в PurchaseView, брошенная регистрация удаляется,
+            # чтобы пользователь мог оформить покупку заново; резерв удалится каскадом
+            Registration.objects.filter(pk__in=registration_ids).delete()
+            released += len(registration_ids)
+
+        if len(registration_ids) < batch_size:
+            return released
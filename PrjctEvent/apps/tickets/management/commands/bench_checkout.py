@@ -0,0 +1,79 @@
+import stripe
+from django.core.management.base import CommandError
+from django.db import DatabaseError, transaction
+
+from apps.tickets import payments
+from apps.tickets.fake_stripe import FakeStripeServer
+from apps.tickets.forms import RegistrationForm
+from apps.tickets.models import Registration
+
+from .load_test_tickets import Command as LoadTestCommand
+
+
+class Command(LoadTestCommand):
+    help = (
+        'Замеряет пропускную способность оформления заказа против фейкового Stripe '
+        'с задержкой: двухфазный PurchaseView (--in-transaction — прежний вариант, '
+        'запрос к Stripe внутри транзакции).'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(purchases=200, concurrency=20, capacity=10000)
+        parser.add_argument('--latency', type=float, default=0.2)
+        parser.add_argument('--failure-rate', type=float, default=0.0)
+        parser.add_argument('--in-transaction', action='store_true')
+
+    def handle(self, *args, **options):
+        self.in_transaction = options['in_transaction']
+        self.server = FakeStripeServer(latency=options['latency'], failure_rate=options['failure_rate']).start()
+        api_base, api_key = stripe.api_base, stripe.api_key
+        stripe.api_base, stripe.api_key = self.server.base_url, api_key or 'sk_test_fake'
+        try:
+            super().handle(*args, **options)
+        finally:
+            stripe.api_base, stripe.api_key = api_base, api_key
+            self.server.stop()
+
+    def purchase(self, event, ticket, buyer, quantity):
+        form = RegistrationForm(data={'ticket_type': ticket.type, 'quantity': quantity}, event=event, user=buyer)
+        try:
+            if not form.is_valid():
+                return 'rejected'
+            if self.in_transaction:
+                with transaction.atomic():
+                    registration = form.save()
+                    registration.reserve()
+                    self.checkout(registration)
+            else:
+                with transaction.atomic():
+                    registration = form.save()
+                    registration.reserve()
+                self.checkout(registration)
+            return 'sold'
+        except ValueError:
+            return 'sold_out'
+        except (DatabaseError, stripe.StripeError):
+            return 'db_error'
+
+    def checkout(self, registration):
+        session = payments.create_checkout_session(
+            registration, success_url='http://testserver/success', cancel_url='http://testserver/cancel'
+        )
+        Registration.objects.filter(pk=registration.pk).update(payment_id=session.id)
+
+    def report(self, ticket, results, elapsed, options):
+        ticket.refresh_from_db()
+        checkouts = Registration.objects.filter(ticket=ticket, payment_id__isnull=False).count()
+        total = sum(results.values())
+        self.stdout.write(
+            f'{"в транзакции" if self.in_transaction else "две фазы"}: {total} оформлений за {elapsed:.2f} s '
+            f'({total / elapsed:.1f}/s), потоков: {options["concurrency"]}, задержка Stripe: {options["latency"]} s\n'
+            f'  сессий: {checkouts}, отказов: {results["rejected"] + results["sold_out"]}, '
+            f'ошибок БД/Stripe: {results["db_error"]}, запросов к Stripe: {self.server.requests} '
+            f'(из них 500: {self.server.failures})'
+        )
+        if ticket.held_count != sum(
+            Registration.objects.filter(ticket=ticket, hold__isnull=False).values_list('quantity', flat=True)
+        ):
+            raise CommandError('held_count не совпадает с резервами.')
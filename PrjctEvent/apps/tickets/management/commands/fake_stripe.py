@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.tickets.fake_stripe import FakeStripeServer
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальный фейковый Stripe API (для тестов: STRIPE_API_BASE=http://host:port)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, секунды')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Доля ответов 500')
+
+    def handle(self, *args, **options):
+        server = FakeStripeServer(
+            (options['host'], options['port']),
+            latency=options['latency'],
+            failure_rate=options['failure_rate'],
+        )
+        self.stdout.write(f'Fake Stripe: STRIPE_API_BASE={server.base_url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.events.models import Event
+from apps.tickets.documents import render_event_tickets
+from apps.tickets.tasks import generate_event_tickets
+
+
+class Command(BaseCommand):
+    help = 'Заранее генерирует PDF-билеты подтверждённых регистраций события (в дисковый кэш)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_slug')
+        parser.add_argument('--async', action='store_true', dest='run_async', help='Поставить задачу в Celery')
+
+    def handle(self, *args, **options):
+        event = Event.objects.get(slug=options['event_slug'])
+        if options['run_async']:
+            generate_event_tickets.delay(event.id)
+            self.stdout.write(f'Генерация билетов для «{event.title}» поставлена в очередь.')
+            return
+        started = time.perf_counter()
+        count = render_event_tickets(event.id)
+        self.stdout.write(f'Билетов: {count} за {time.perf_counter() - started:.2f} s')
@@ -0,0 +1,110 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Sum
+
+from apps.events.models import Event
+from apps.tickets.forms import RegistrationForm
+from apps.tickets.models import Registration, Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест продажи билетов: параллельные покупки через RegistrationForm, '
+        'Registration.reserve и Registration.confirm против одного Ticket. Проверяет отсутствие перепродажи '
+        'и выводит пропускную способность. Запускать на PostgreSQL: SQLite сериализует запись.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purchases', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--capacity', type=int, default=500)
+        parser.add_argument('--per-order', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданные событие и пользователей')
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        User = get_user_model()
+        author = User.objects.create_user(email=f'load-{run}-author@example.com', password=None)
+        event = Event.objects.create(
+            title=f'Load test {run}',
+            description='-',
+            short_description='-',
+            author=author,
+            status=Event.Status.PUBLISHED,
+        )
+        ticket = Ticket.objects.create(event=event, price=100, quantity_available=options['capacity'])
+        buyers = [User(email=f'load-{run}-{i}@example.com') for i in range(options['purchases'])]
+        for buyer in buyers:
+            buyer.set_unusable_password()
+        buyers = User.objects.bulk_create(buyers, batch_size=500)
+
+        try:
+            results, elapsed = self.run_purchases(event, ticket, buyers, options)
+            self.report(ticket, results, elapsed, options)
+        finally:
+            if not options['keep']:
+                event.delete()
+                User.objects.filter(email__startswith=f'load-{run}-').delete()
+
+    def run_purchases(self, event, ticket, buyers, options):
+        concurrency = max(1, min(options['concurrency'], len(buyers)))
+        start = threading.Barrier(concurrency)
+
+        def worker(chunk):
+            results = Counter()
+            start.wait()
+            try:
+                for buyer in chunk:
+                    results[self.purchase(event, ticket, buyer, options['per_order'])] += 1
+            finally:
+                connection.close()
+            return results
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            chunks = [buyers[i::concurrency] for i in range(concurrency)]
+            results = sum((future.result() for future in [executor.submit(worker, c) for c in chunks]), Counter())
+        return results, time.perf_counter() - started
+
+    def purchase(self, event, ticket, buyer, quantity):
+        form = RegistrationForm(data={'ticket_type': ticket.type, 'quantity': quantity}, event=event, user=buyer)
+        try:
+            if not form.is_valid():
+                return 'rejected'
+            with transaction.atomic():
+                registration = form.save()
+                registration.reserve()
+                registration.confirm(f'load_{registration.pk}')
+            return 'sold'
+        except (ValueError, ValidationError):
+            return 'sold_out'
+        except DatabaseError:
+            return 'db_error'
+
+    def report(self, ticket, results, elapsed, options):
+        ticket.refresh_from_db()
+        confirmed = (
+            Registration.objects
+            .filter(ticket=ticket, status=Registration.Status.CONFIRMED)
+            .aggregate(total=Sum('quantity'))['total'] or 0
+        )
+        total = sum(results.values())
+        self.stdout.write(
+            f'Покупок: {total} за {elapsed:.2f} s ({total / elapsed:.0f}/s), '
+            f'потоков: {options["concurrency"]}\n'
+            f'  продано: {results["sold"]}, отказ формы: {results["rejected"]}, '
+            f'отказ при списании: {results["sold_out"]}, ошибок БД: {results["db_error"]}\n'
+            f'  sold_count={ticket.sold_count}, held_count={ticket.held_count}, подтверждено билетов={confirmed}, '
+            f'quantity_available={ticket.quantity_available}'
+        )
+        if ticket.sold_count > ticket.quantity_available or ticket.sold_count != confirmed or ticket.held_count:
+            raise CommandError('Перепродажа: счётчики билета не совпадают с подтверждёнными регистрациями.')
+        self.stdout.write(self.style.SUCCESS('Перепродажи нет.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.tickets import revenue
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги выручки по журналу; --backfill заносит в журнал старые подтверждённые регистрации'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            created = revenue.backfill()
+            self.stdout.write(f'Добавлено записей в журнал: {created}')
+        else:
+            revenue.rebuild_totals()
+        self.stdout.write('Итоги выручки пересчитаны.')
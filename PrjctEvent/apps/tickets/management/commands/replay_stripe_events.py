@@ -0,0 +1,53 @@
+import stripe
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+# payments настраивает клиент Stripe для --fetch
+from apps.tickets import payments, webhooks  # noqa: F401
+from apps.tickets.models import StripeEvent
+
+
+class Command(BaseCommand):
+    help = 'Повторно обрабатывает события Stripe из inbox (по id или фильтрам)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='ID событий Stripe (evt_...)')
+        parser.add_argument('--status', choices=StripeEvent.Status.values)
+        parser.add_argument('--type')
+        parser.add_argument('--since', help='Получены не раньше (ISO 8601)')
+        parser.add_argument(
+            '--fetch', action='store_true',
+            help='Загрузить из Stripe события, которых нет в inbox'
+        )
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('event_ids', 'status', 'type', 'since')):
+            raise CommandError('Укажите ID событий или хотя бы один фильтр.')
+
+        queryset = StripeEvent.objects.all()
+        if options['event_ids']:
+            if options['fetch']:
+                self.fetch_missing(options['event_ids'])
+            queryset = queryset.filter(event_id__in=options['event_ids'])
+        if options['status']:
+            queryset = queryset.filter(status=options['status'])
+        if options['type']:
+            queryset = queryset.filter(type=options['type'])
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('Неверный формат --since.')
+            queryset = queryset.filter(received_at__gte=since)
+        total = queryset.count()
+        processed = webhooks.replay(queryset)
+        self.stdout.write(f'Событий: {total}, обработано: {processed}, с ошибкой: {total - processed}')
+
+    def fetch_missing(self, event_ids):
+        known = set(StripeEvent.objects.filter(event_id__in=event_ids).values_list('event_id', flat=True))
+        for event_id in set(event_ids) - known:
+            try:
+                event = stripe.Event.retrieve(event_id)
+            except stripe.StripeError as e:
+                raise CommandError(f'Не удалось загрузить {event_id}: {e}')
+            webhooks.record(event.to_dict())
+            self.stdout.write(f'Загружено из Stripe: {event_id}')
@@ -1,7 +1,11 @@
+from datetime import timedelta
+
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from apps.events import fragment_cache
 from apps.events.models import Event
 from django.conf import settings
 
@@ -31,6 +35,8 @@ class Ticket(models.Model):
     )
     quantity_available = models.PositiveIntegerField(default=100, verbose_name=_('Доступное количество'))
     sold_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Продано'))
+    # Сумма активных резервов TicketHold, чтобы проверка остатка не суммировала их
+    held_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Зарезервировано'))
 
     class Meta:
         unique_together = ('event', 'type')
@@ -47,18 +53,65 @@ class Ticket(models.Model):
         if self.sold_count > self.quantity_available:
             raise ValidationError('Продано больше, чем доступно')
 
+    @property
+    def available_count(self):
+        return self.quantity_available - self.sold_count - self.held_count
+
     def is_available(self, qty=1):
-        return (self.quantity_available - self.sold_count) >= qty
+        return self.available_count >= qty
+
+    def _update_counts(self, condition, **changes):
+        updated = Ticket.objects.filter(condition, pk=self.pk).update(**changes)
+        if updated:
+            self.refresh_from_db(fields=['sold_count', 'held_count'])
+            # update() минует post_save, а остаток билетов виден в кэшированной карточке события.
+            # В списке событий счётчиков нет, поэтому общий scope 'events' продажи не сбрасывают
+            fragment_cache.invalidate(f'event:{self.event_id}')
+        return updated
+
+    def _has_room(self, qty):
+        return models.Q(sold_count__lte=models.F('quantity_available') - models.F('held_count') - qty)
 
-    @transaction.atomic
     def sell(self, qty=1):
-        if not self.is_available(qty):
+        """
+        Списывает qty билетов одним условным UPDATE: строка меняется, только
+        если остатка хватает, поэтому параллельные покупки не могут продать
+        больше quantity_available и не блокируют друг друга на чтении.
+        """
+        if not self._update_counts(self._has_room(qty), sold_count=models.F('sold_count') + qty):
             raise ValueError('Недостаточно билетов.')
-        self.sold_count += qty
-        self.save(update_fields=['sold_count'])
+
+    def release(self, qty=1):
+        if not self._update_counts(models.Q(sold_count__gte=qty), sold_count=models.F('sold_count') - qty):
+            raise ValueError('Нельзя вернуть больше проданного.')
+
+    def hold(self, qty=1):
+        if not self._update_counts(self._has_room(qty), held_count=models.F('held_count') + qty):
+            raise ValueError('Недостаточно билетов.')
+
+    def sell_held(self, qty=1):
+        # Резерв уже вычтен из остатка, поэтому проверять quantity_available не нужно
+        converted = self._update_counts(
+            models.Q(held_count__gte=qty),
+            held_count=models.F('held_count') - qty,
+            sold_count=models.F('sold_count') + qty,
+        )
+        if not converted:
+            raise ValueError('Резерв не найден.')
+
+    def release_hold(self, qty=1):
+        if not self._update_counts(models.Q(held_count__gte=qty), held_count=models.F('held_count') - qty):
+            raise ValueError('Резерв не найден.')
 
     def save(self, *args, **kwargs):
         self.clean()
+        if not self._state.adding and not kwargs.get('force_insert') and 'update_fields' not in kwargs:
+            # Счётчики меняют только sell()/hold() и т.п.: сохранение устаревшего
+            # экземпляра (например, из админки) не должно затирать продажи
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('sold_count', 'held_count')
+            ]
         super().save(*args, **kwargs)
 
 
@@ -125,30 +178,232 @@ class Registration(models.Model):
             raise ValidationError(_('Для платного билета нужен payment_id'))
         if self.quantity < 1:
             raise ValidationError(_('Количество должно быть больше нуля.'))
-        if self.ticket and not self.ticket.is_available(self.quantity):
+        # Остаток проверяется только при создании: окончательно его
+        # гарантирует условный UPDATE в Ticket.sell()
+        if self.ticket and self._state.adding and not self.ticket.is_available(self.quantity):
             raise ValidationError(_('Недостаточно билетов.'))
 
     @transaction.atomic
     def confirm(self, payment_id=None):
-        if self.status != self.Status.PENDING:
+        # Переход PENDING -> CONFIRMED тоже условный: из одновременных
+        # подтверждений (SuccessView и webhook) билеты спишет только одно
+        claimed = Registration.objects.filter(pk=self.pk, status=self.Status.PENDING).update(
+            status=self.Status.CONFIRMED
+        )
+        if not claimed:
             raise ValidationError(_('Уже обработано.'))
         self.status = self.Status.CONFIRMED
         if payment_id:
             self.payment_id = payment_id
         if self.ticket:
-            self.ticket.sell(self.quantity)
+            if self._drop_hold():
+                self.ticket.sell_held(self.quantity)
+            else:
+                # Резерва нет (регистрация без него): продаём из общего остатка
+                self.ticket.sell(self.quantity)
             self.total_amount = self.ticket.price * self.quantity
         self.save()
+        if self.ticket:
+            RevenueEntry.record(self, RevenueEntry.Kind.SALE)
 
     @transaction.atomic
     def cancel(self, payment_id=None):
-        if self.status == self.Status.CONFIRMED and self.ticket:
-            self.ticket.sold_count = models.F('sold_count') - self.quantity
-            self.ticket.quantity_available = models.F('quantity_available') + self.quantity
-            self.ticket.save()
+        # Билеты возвращаются, только если подтверждение снял именно этот вызов
+        unconfirmed = Registration.objects.filter(pk=self.pk, status=self.Status.CONFIRMED).update(
+            status=self.Status.CANCELLED
+        )
+        if unconfirmed and self.ticket:
+            self.ticket.release(self.quantity)
+            RevenueEntry.record(self, RevenueEntry.Kind.REFUND)
+        abandoned = Registration.objects.filter(pk=self.pk, status=self.Status.PENDING).update(
+            status=self.Status.CANCELLED
+        )
+        if abandoned and self.ticket and self._drop_hold():
+            self.ticket.release_hold(self.quantity)
         self.status = self.Status.CANCELLED
         self.save()
 
+    @transaction.atomic
+    def reserve(self, ttl=None):
+        """
+        Резервирует билеты на время оплаты. Резерв снимается при confirm()/cancel()
+        или задачей release_expired_holds по истечении TICKET_HOLD_TTL.
+        """
+        ttl = ttl if ttl is not None else settings.TICKET_HOLD_TTL
+        self.ticket.hold(self.quantity)
+        return TicketHold.objects.create(
+            registration=self,
+            ticket=self.ticket,
+            quantity=self.quantity,
+            expires_at=timezone.now() + timedelta(seconds=ttl),
+        )
+
+    def _drop_hold(self):
+        # Удаление строки резерва — условие: снять его может только один вызов
+        return TicketHold.objects.filter(registration=self).delete()[0]
+
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
+
+
+class TicketHold(models.Model):
+    registration = models.OneToOneField(
+        Registration,
+        on_delete=models.CASCADE,
+        related_name='hold',
+        verbose_name=_('Регистрация')
+    )
+    ticket = models.ForeignKey(
+        Ticket,
+        on_delete=models.CASCADE,
+        related_name='holds',
+        verbose_name=_('Билет')
+    )
+    quantity = models.PositiveIntegerField(verbose_name=_('Количество'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создан'))
+    expires_at = models.DateTimeField(db_index=True, verbose_name=_('Истекает'))
+
+    class Meta:
+        verbose_name = _('Резерв билетов')
+        verbose_name_plural = _('Резервы билетов')
+
+    def __str__(self):
+        return f'{self.registration} — {self.quantity} до {self.expires_at:%H:%M}'
+
+
+class StripeEvent(models.Model):
+    """Входящий журнал (inbox) webhook-событий Stripe: одна строка на event id."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Ожидает обработки')
+        PROCESSED = 'processed', _('Обработано')
+        FAILED = 'failed', _('Ошибка')
+
+    event_id = models.CharField(max_length=255, unique=True, verbose_name=_('ID события Stripe'))
+    type = models.CharField(max_length=100, verbose_name=_('Тип'))
+    payload = models.JSONField(verbose_name=_('Данные'))
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name=_('Статус')
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_('Попыток'))
+    error = models.TextField(blank=True, verbose_name=_('Ошибка'))
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Получено'))
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Обработано'))
+
+    class Meta:
+        verbose_name = _('Событие Stripe')
+        verbose_name_plural = _('События Stripe')
+        indexes = [models.Index(fields=['status', 'received_at'])]
+
+    def __str__(self):
+        return f'{self.event_id} ({self.type})'
+
+
+class RevenueEntry(models.Model):
+    """
+    Журнал выручки: строки только добавляются. Подтверждение регистрации
+    пишет продажу, отмена подтверждённой — сторно с отрицательными суммами.
+    """
+
+    class Kind(models.TextChoices):
+        SALE = 'sale', _('Продажа')
+        REFUND = 'refund', _('Возврат')
+
+    registration = models.ForeignKey(
+        Registration,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='revenue_entries',
+        verbose_name=_('Регистрация')
+    )
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='revenue_entries',
+        verbose_name=_('Событие')
+    )
+    organizer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='revenue_entries',
+        verbose_name=_('Организатор')
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices, verbose_name=_('Тип'))
+    quantity = models.IntegerField(verbose_name=_('Количество'))
+    amount = models.DecimalField(max_digits=20, decimal_places=2, verbose_name=_('Сумма'))
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_('Создано'))
+
+    class Meta:
+        verbose_name = _('Запись о выручке')
+        verbose_name_plural = _('Журнал выручки')
+        indexes = [
+            models.Index(fields=['event', 'created_at']),
+            models.Index(fields=['organizer', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.amount} — {self.event_id}'
+
+    @classmethod
+    def record(cls, registration, kind):
+        """Добавляет запись и сдвигает итоги события и организатора в той же транзакции."""
+        sign = -1 if kind == cls.Kind.REFUND else 1
+        entry = cls.objects.create(
+            registration=registration,
+            event_id=registration.event_id,
+            organizer_id=registration.event.author_id,
+            kind=kind,
+            quantity=sign * registration.quantity,
+            amount=sign * registration.total_amount,
+        )
+        for model, pk in ((EventRevenue, entry.event_id), (OrganizerRevenue, entry.organizer_id)):
+            model.objects.bulk_create([model(pk=pk)], ignore_conflicts=True)
+            model.objects.filter(pk=pk).update(
+                amount=models.F('amount') + entry.amount,
+                quantity=models.F('quantity') + entry.quantity,
+            )
+        return entry
+
+
+class EventRevenue(models.Model):
+    """Нарастающий итог журнала выручки по событию."""
+    event = models.OneToOneField(
+        Event,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='revenue',
+        verbose_name=_('Событие')
+    )
+    amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name=_('Выручка'))
+    quantity = models.IntegerField(default=0, verbose_name=_('Продано билетов'))
+
+    class Meta:
+        verbose_name = _('Выручка события')
+        verbose_name_plural = _('Выручка событий')
+
+    def __str__(self):
+        return f'{self.event}: {self.amount}'
+
+
+class OrganizerRevenue(models.Model):
+    """Нарастающий итог журнала выручки по организатору."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='revenue',
+        verbose_name=_('Организатор')
+    )
+    amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name=_('Выручка'))
+    quantity = models.IntegerField(default=0, verbose_name=_('Продано билетов'))
+
+    class Meta:
+        verbose_name = _('Выручка организатора')
+        verbose_name_plural = _('Выручка организаторов')
+
+    def __str__(self):
+        return f'{self.user}: {self.amount}'
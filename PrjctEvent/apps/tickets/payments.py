@@ -0,0 +1,66 @@
+import logging
+import time
+
+import stripe
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def configure():
+    """
+    Общие настройки клиента Stripe: таймауты и повторы. Библиотека сама
+    повторяет запрос при обрыве соединения, 409 и 5xx, отправляя тот же
+    Idempotency-Key, поэтому повтор не создаст вторую сессию.
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    if settings.STRIPE_API_BASE:
+        stripe.api_base = settings.STRIPE_API_BASE
+    stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+    stripe.default_http_client = stripe.RequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT)
+    )
+
+
+configure()
+
+
+# Stripe отклоняет expires_at ближе чем через 30 минут; минута запаса —
+# на путь запроса и повторы с тем же Idempotency-Key
+STRIPE_MIN_CHECKOUT_TTL = 30 * 60 + 60
+
+
+def checkout_ttl():
+    """Срок сессии оплаты: TICKET_CHECKOUT_TTL, но не меньше минимума Stripe."""
+    return max(settings.TICKET_CHECKOUT_TTL, STRIPE_MIN_CHECKOUT_TTL)
+
+
+def create_checkout_session(registration, success_url, cancel_url):
+    """
+    Создаёт сессию оплаты для PENDING-регистрации. Вызывается вне транзакции:
+    сетевой запрос к Stripe не должен держать открытой транзакцию БД.
+    """
+    ticket = registration.ticket
+    started = time.perf_counter()
+    session = stripe.checkout.Session.create(
+        payment_method_types=['card'],
+        line_items=[{
+            'price_data': {
+                'currency': 'rub',
+                'product_data': {
+                    'name': f'{ticket.get_type_display()} - {registration.event.title}',
+                },
+                'unit_amount': int(ticket.price * 100),
+            },
+            'quantity': registration.quantity,
+        }],
+        mode='payment',
+        success_url=success_url,
+        cancel_url=cancel_url,
+        metadata={'registration_id': str(registration.id)},
+        expires_at=int(time.time()) + checkout_ttl(),
+        idempotency_key=f'registration_{registration.id}'
+    )
+    logger.info(f"Stripe session {session.id} created in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return session
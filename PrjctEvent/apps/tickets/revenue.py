@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import EventRevenue, OrganizerRevenue, Registration, RevenueEntry
+
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def entries(event=None, organizer=None, since=None, until=None):
+    queryset = RevenueEntry.objects.all()
+    if event is not None:
+        queryset = queryset.filter(event=event)
+    if organizer is not None:
+        queryset = queryset.filter(organizer=organizer)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+def series(period='day', **filters):
+    """Выручка и проданные билеты по дням/неделям/месяцам: [{'period', 'amount', 'quantity'}]."""
+    return list(
+        entries(**filters)
+        .annotate(period=PERIODS[period]('created_at'))
+        .values('period')
+        .annotate(amount=Sum('amount'), quantity=Sum('quantity'))
+        .order_by('period')
+    )
+
+
+def totals(event=None, organizer=None):
+    """Итог по событию или организатору — одна строка по первичному ключу."""
+    model, pk = (EventRevenue, event) if event is not None else (OrganizerRevenue, organizer)
+    row = model.objects.filter(pk=getattr(pk, 'pk', pk)).values('amount', 'quantity').first()
+    return row or {'amount': Decimal(0), 'quantity': 0}
+
+
+def rebuild_totals():
+    """Пересчитывает итоги по журналу (после ручных правок или заполнения истории)."""
+    with transaction.atomic():
+        for model, field in ((EventRevenue, 'event_id'), (OrganizerRevenue, 'organizer_id')):
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [
+                    model(pk=row[field], amount=row['amount'], quantity=row['quantity'])
+                    for row in RevenueEntry.objects.values(field).annotate(
+                        amount=Sum('amount'), quantity=Sum('quantity')
+                    ).order_by()
+                ],
+                batch_size=500,
+            )
+
+
+def backfill(batch_size=500):
+    """
+    Заносит в журнал подтверждённые регистрации, подтверждённые до его
+    появления (время записи — purchase_date), и пересчитывает итоги.
+    """
+    missing = (
+        Registration.objects
+        .filter(status=Registration.Status.CONFIRMED, ticket__isnull=False)
+        .exclude(Exists(RevenueEntry.objects.filter(registration=OuterRef('pk'))))
+        .select_related('event')
+        .order_by('pk')
+    )
+    created = 0
+    batch = []
+    for registration in missing.iterator(chunk_size=batch_size):
+        batch.append(RevenueEntry(
+            registration=registration,
+            event_id=registration.event_id,
+            organizer_id=registration.event.author_id,
+            kind=RevenueEntry.Kind.SALE,
+            quantity=registration.quantity,
+            amount=registration.total_amount,
+            created_at=registration.purchase_date,
+        ))
+        if len(batch) == batch_size:
+            created += len(RevenueEntry.objects.bulk_create(batch))
+            batch = []
+    created += len(RevenueEntry.objects.bulk_create(batch))
+    rebuild_totals()
+    return created
@@ -1,27 +1,34 @@
 from celery import shared_task
 from django.core.mail import EmailMessage
-from weasyprint import HTML
-from io import BytesIO
 from .models import Registration
+from .holds import release_expired
+from . import documents, webhooks
+from apps.notifications import mailer
 from django.conf import settings
 
 
 @shared_task
 def send_ticket_email(registration_id):
-    registration = Registration.objects.get(id=registration_id)
+    registration = Registration.objects.select_related('event', 'ticket', 'user').get(id=registration_id)
     subject = f"Ваш билет на {registration.event.title}"
     message = f"Спасибо за покупку билета на '{registration.event.title}'!"
     email = EmailMessage(
         subject, message, settings.DEFAULT_FROM_EMAIL, [registration.user.email]
     )
-    
-    html_content = f"""
-    <h1>Билет на {registration.event.title}</h1>
-    <p>Пользователь: {registration.user.email}</p>
-    <p>Тип: {registration.ticket.get_type_display() if registration.ticket else 'Бесплатно'}</p>
-    <p>Количество: {registration.quantity}</p>
-    """
-    pdf_file = BytesIO()
-    HTML(string=html_content).write_pdf(pdf_file)
-    email.attach(f'ticket_{registration.id}.pdf', pdf_file.getvalue(), 'application/pdf')
-    email.send()
+    email.attach(f'ticket_{registration.id}.pdf', documents.get_ticket_pdf(registration), 'application/pdf')
+    mailer.send_messages([email])
+
+
+@shared_task
+def generate_event_tickets(event_id):
+    return documents.render_event_tickets(event_id)
+
+
+@shared_task
+def release_expired_holds():
+    return release_expired()
+
+
+@shared_task
+def process_stripe_events():
+    return webhooks.process_pending()
@@ -1,3 +1,417 @@
-from django.test import TestCase
+import io
+import os
+import threading
+import time
+import tracemalloc
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+import stripe
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature, tag,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.events.models import Event
+from apps.notifications.models import Notification
+from . import payments, revenue, webhooks
+from .fake_stripe import FakeStripeServer
+from .models import EventRevenue, OrganizerRevenue, Registration, RevenueEntry, StripeEvent, Ticket, TicketHold
+
+
+class RegistrationExportFixture:
+    """SIDE событий x SIDE участников, вставленные одним INSERT ... SELECT."""
+    SIDE = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(email='export-staff@example.com', password=None, is_staff=True)
+        cls.organizer = User.objects.create_user(email='export-organizer@example.com', password=None)
+        now = timezone.now()
+        events = Event.objects.bulk_create([
+            Event(
+                title=f'Export {i}', slug=f'export-{i}', description='-', author=cls.organizer,
+                start_datetime=now, end_datetime=now + timedelta(hours=1),
+            )
+            for i in range(cls.SIDE)
+        ])
+        cls.event = events[0]
+        User.objects.bulk_create([User(email=f'export-{i}@example.com') for i in range(cls.SIDE)])
+
+        # Строки одним INSERT ... SELECT, без моделей в памяти теста
+        registration, user, event = (model._meta.db_table for model in (Registration, User, Event))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {registration} (user_id, event_id, quantity, status, purchase_date, total_amount) "
+                f"SELECT u.id, e.id, 1, CASE WHEN u.id %% 2 = 0 THEN %s ELSE %s END, %s, 150 "
+                f"FROM {user} u CROSS JOIN {event} e "
+                f"WHERE u.email LIKE 'export-%%' AND u.is_staff = %s AND e.slug LIKE 'export-%%'",
+                [Registration.Status.CONFIRMED, Registration.Status.PENDING, now, False],
+            )
+
+    def export_csv(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('tickets:export_registrations'), params)
+        self.assertTrue(response.streaming)
+        return response
+
+
+class RegistrationExportTests(RegistrationExportFixture, TestCase):
+    def test_csv_lists_every_registration(self):
+        content = b''.join(self.export_csv().streaming_content).decode('utf-8-sig')
+        # Организатор тоже участник выгрузки: SIDE + 1 пользователь без is_staff
+        self.assertEqual(content.count('\n'), 1 + (self.SIDE + 1) * self.SIDE)
+
+    def create_formula_registration(self):
+        user = get_user_model().objects.create_user(
+            email='formula@example.com', password=None, first_name='=HYPERLINK("http://evil")', last_name='@SUM(A1)',
+        )
+        Event.objects.filter(pk=self.event.pk).update(title='+1+2')
+        Registration.objects.create(user=user, event=self.event, quantity=1, total_amount=0)
+
+    def test_formulas_are_neutralized_in_csv(self):
+        self.create_formula_registration()
+        content = b''.join(self.export_csv(event=self.event.slug).streaming_content).decode('utf-8-sig')
+        self.assertIn("'=HYPERLINK", content)
+        self.assertIn("'@SUM(A1)", content)
+        self.assertIn("'+1+2", content)
+
+    def test_xlsx_keeps_text_as_is(self):
+        # inlineStr не вычисляется как формула, апостроф был бы виден в ячейке
+        self.create_formula_registration()
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('tickets:export_registrations'), {'format': 'xlsx', 'event': self.event.slug})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        texts = {node.text for node in sheet.iter('{http://schemas.openxmlformats.org/spreadsheetml/2006/main}t')}
+        self.assertLessEqual({'=HYPERLINK("http://evil")', '@SUM(A1)', '+1+2'}, texts)
+        self.assertFalse([text for text in texts if text and text.startswith("'")])
+
+    def test_xlsx_filtered_by_event_and_status(self):
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse('tickets:export_registrations'), {
+            'format': 'xlsx', 'event': self.event.slug, 'status': Registration.Status.CONFIRMED,
+        })
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        rows = sheet.findall('.//{http://schemas.openxmlformats.org/spreadsheetml/2006/main}row')
+        expected = Registration.objects.filter(event=self.event, status=Registration.Status.CONFIRMED).count()
+        self.assertEqual(len(rows), 1 + expected)
+
+    def test_organizer_cannot_export_foreign_event(self):
+        other = get_user_model().objects.create_user(email='export-other@example.com', password=None)
+        self.client.force_login(other)
+        response = self.client.get(reverse('tickets:export_registrations'), {'event': self.event.slug})
+        self.assertEqual(response.status_code, 404)
+
+
+# Вставляет миллион строк (пара минут), поэтому по умолчанию пропускается:
+# RUN_SLOW_TESTS=1 python manage.py test --tag slow
+@tag('slow')
+@skipUnless(os.getenv('RUN_SLOW_TESTS'), 'RUN_SLOW_TESTS не задан')
+class RegistrationExportMemoryTests(RegistrationExportFixture, TestCase):
+    # 1000 событий x 1000 участников = 1 000 000 регистраций
+    SIDE = 1000
+    MEMORY_CEILING = 8 * 1024 * 1024
+
+    def test_csv_streams_million_rows_in_constant_memory(self):
+        response = self.export_csv()
+        lines = 0
+        tracemalloc.start()
+        try:
+            for chunk in response.streaming_content:
+                lines += chunk.count(b'\n')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(lines, 1 + (self.SIDE + 1) * self.SIDE)
+        self.assertLess(peak, self.MEMORY_CEILING)
+
+
+class CheckoutSessionTests(SimpleTestCase):
+    @override_settings(TICKET_CHECKOUT_TTL=10 * 60)
+    def test_expires_at_respects_stripe_minimum(self):
+        registration = mock.Mock(id=1, quantity=1)
+        registration.ticket.price = 100
+        with mock.patch('stripe.checkout.Session.create') as create:
+            payments.create_checkout_session(registration, 'http://testserver/ok', 'http://testserver/cancel')
+        ttl = create.call_args.kwargs['expires_at'] - time.time()
+        self.assertGreater(ttl, 30 * 60)
+
+
+class PurchaseCheckoutTests(TestCase):
+    """Двухфазное оформление PurchaseView против локального FakeStripeServer."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeStripeServer().start()
+        cls.addClassCleanup(cls.server.stop)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = get_user_model().objects.create_user(email='buyer@example.com', password=None)
+        organizer = get_user_model().objects.create_user(email='seller@example.com', password=None)
+        cls.event = Event.objects.create(title='Концерт', description='-', short_description='-', author=organizer)
+        cls.ticket = Ticket.objects.create(event=cls.event, price=500, quantity_available=10)
+
+    def setUp(self):
+        self.server.latency, self.server.failure_rate = 0.0, 0.0
+        for name, value in (('api_base', self.server.base_url), ('api_key', 'sk_test_fake'), ('max_network_retries', 0)):
+            patcher = mock.patch.object(stripe, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client.force_login(self.buyer)
+        self.url = reverse('tickets:purchase', kwargs={'event_slug': self.event.slug})
+
+    def purchase(self):
+        return self.client.post(self.url, {'ticket_type': self.ticket.type, 'quantity': 2})
+
+    def assert_rolled_back(self, response):
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertFalse(Registration.objects.filter(user=self.buyer).exists())
+        self.assertFalse(TicketHold.objects.exists())
+        self.ticket.refresh_from_db()
+        self.assertEqual((self.ticket.held_count, self.ticket.sold_count), (0, 0))
+
+    def test_checkout_redirects_to_stripe_and_keeps_the_hold(self):
+        response = self.purchase()
+
+        registration = Registration.objects.get(user=self.buyer)
+        session = self.server.sessions[registration.payment_id]
+        self.assertRedirects(response, session['url'], fetch_redirect_response=False)
+        self.assertEqual(registration.status, Registration.Status.PENDING)
+        self.assertEqual(session['metadata'], {'registration_id': str(registration.pk)})
+        self.assertEqual(registration.hold.quantity, 2)
+        self.ticket.refresh_from_db()
+        self.assertEqual((self.ticket.held_count, self.ticket.sold_count), (2, 0))
+
+    def test_stripe_error_cancels_pending_registration(self):
+        self.server.failure_rate = 1.0
+        self.assert_rolled_back(self.purchase())
+
+    def test_stripe_timeout_cancels_pending_registration(self):
+        self.server.latency = 0.5
+        with mock.patch.object(stripe, 'default_http_client', stripe.RequestsClient(timeout=(1, 0.1))):
+            response = self.purchase()
+        self.assert_rolled_back(response)
+
+
+class StripeInboxFixture:
+    def create_pending(self):
+        buyer = get_user_model().objects.create_user(email='inbox-buyer@example.com', password=None)
+        organizer = get_user_model().objects.create_user(email='inbox-organizer@example.com', password=None)
+        with mock.patch('apps.notifications.signals.fan_out_notifications.delay'):
+            event = Event.objects.create(title='Оплата', description='-', short_description='-', author=organizer)
+        ticket = Ticket.objects.create(event=event, price=300, quantity_available=5)
+        registration = Registration.objects.create(
+            user=buyer, event=event, ticket=ticket, quantity=2, total_amount=600
+        )
+        registration.reserve()
+        return registration
+
+    def completed(self, registration, event_id='evt_1'):
+        return {
+            'id': event_id,
+            'type': 'checkout.session.completed',
+            'data': {'object': {'metadata': {'registration_id': str(registration.pk)}, 'payment_intent': 'pi_1'}},
+        }
+
+    def assert_confirmed_once(self, registration):
+        registration.refresh_from_db()
+        registration.ticket.refresh_from_db()
+        self.assertEqual(registration.status, Registration.Status.CONFIRMED)
+        self.assertEqual((registration.ticket.sold_count, registration.ticket.held_count), (2, 0))
+        self.assertEqual(RevenueEntry.objects.filter(registration=registration).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=registration.user, notification_type='TICKET').count(), 1)
+
+
+class StripeInboxTests(StripeInboxFixture, TestCase):
+    def setUp(self):
+        self.registration = self.create_pending()
+
+    def test_duplicate_delivery_is_stored_and_processed_once(self):
+        for _ in range(2):
+            webhooks.record(self.completed(self.registration))
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        self.assertEqual(webhooks.process_pending(), 1)
+        self.assertEqual(webhooks.process_pending(), 0)
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.Status.PROCESSED)
+        self.assert_confirmed_once(self.registration)
+
+    @override_settings(STRIPE_INBOX_MAX_ATTEMPTS=2)
+    def test_failed_event_is_retried_then_replayed(self):
+        webhooks.record(self.completed(self.registration))
+        broken = mock.Mock(side_effect=RuntimeError('сбой обработчика'))
+        with mock.patch.dict(webhooks.HANDLERS, {'checkout.session.completed': broken}), \
+                self.assertLogs('apps.tickets.webhooks', 'ERROR'):
+            self.assertEqual(webhooks.process_pending(), 0)
+            inbox = StripeEvent.objects.get()
+            self.assertEqual((inbox.status, inbox.attempts), (StripeEvent.Status.PENDING, 1))
+
+            self.assertEqual(webhooks.process_pending(), 0)
+            inbox.refresh_from_db()
+            self.assertEqual((inbox.status, inbox.attempts), (StripeEvent.Status.FAILED, 2))
+            self.assertEqual(inbox.error, 'сбой обработчика')
+            # Исчерпавшее попытки событие проход больше не берёт
+            webhooks.process_pending()
+        self.assertEqual(broken.call_count, 2)
+
+        self.assertEqual(webhooks.replay(StripeEvent.objects.all()), 1)
+        inbox.refresh_from_db()
+        self.assertEqual((inbox.status, inbox.attempts, inbox.error), (StripeEvent.Status.PROCESSED, 1, ''))
+        self.assert_confirmed_once(self.registration)
+
+        # Повторный replay уже обработанного события ничего не меняет
+        webhooks.replay(StripeEvent.objects.all())
+        self.assert_confirmed_once(self.registration)
+
+    def test_overlapping_workers_confirm_once(self):
+        # Без SKIP LOCKED (SQLite) второй воркер видит ту же строку: от повторного
+        # подтверждения защищает условный UPDATE в Registration.confirm
+        webhooks.record(self.completed(self.registration))
+        handle = webhooks.HANDLERS['checkout.session.completed']
+        nested = []
+
+        def racing_handler(session):
+            if not nested:
+                nested.append(None)
+                nested[0] = webhooks.process_pending()
+            handle(session)
+
+        with mock.patch.dict(webhooks.HANDLERS, {'checkout.session.completed': racing_handler}):
+            self.assertEqual(webhooks.process_pending(), 1)
+        self.assertEqual(nested, [1])
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.Status.PROCESSED)
+        self.assert_confirmed_once(self.registration)
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class StripeInboxConcurrencyTests(StripeInboxFixture, TransactionTestCase):
+    def test_second_worker_skips_claimed_event(self):
+        registration = self.create_pending()
+        webhooks.record(self.completed(registration))
+        handle = webhooks.HANDLERS['checkout.session.completed']
+        second = {}
+
+        def other_worker():
+            try:
+                second['processed'] = webhooks.process_pending()
+            finally:
+                connection.close()
+
+        def racing_handler(session):
+            # Второй воркер запускается, пока первый держит строку пачки заблокированной
+            worker = threading.Thread(target=other_worker)
+            worker.start()
+            worker.join()
+            handle(session)
+
+        with mock.patch.dict(webhooks.HANDLERS, {'checkout.session.completed': racing_handler}), \
+                mock.patch('apps.tickets.webhooks.send_notification_email.delay'), \
+                mock.patch('apps.tickets.tasks.send_ticket_email.delay'):
+            self.assertEqual(webhooks.process_pending(), 1)
+
+        self.assertEqual(second['processed'], 0)
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.Status.PROCESSED)
+        self.assert_confirmed_once(registration)
+
+
+class RevenueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = get_user_model().objects.create_user(email='revenue-organizer@example.com', password=None)
+        cls.event = Event.objects.create(title='Выручка', description='-', short_description='-', author=cls.organizer)
+        cls.ticket = Ticket.objects.create(event=cls.event, price=250, quantity_available=50)
+
+    def register(self, quantity=2, confirm=True):
+        index = Registration.objects.count()
+        buyer = get_user_model().objects.create_user(email=f'revenue-{index}@example.com', password=None)
+        registration = Registration.objects.create(
+            user=buyer, event=self.event, ticket=self.ticket, quantity=quantity, total_amount=250 * quantity
+        )
+        registration.reserve()
+        if confirm:
+            registration.confirm(f'pi_{index}')
+        return registration
+
+    def totals(self):
+        return revenue.totals(event=self.event), revenue.totals(organizer=self.organizer)
+
+    def assert_totals(self, amount, quantity):
+        for row in self.totals():
+            self.assertEqual((row['amount'], row['quantity']), (Decimal(amount), quantity))
+
+    def test_confirm_writes_sale_and_bumps_totals(self):
+        registration = self.register()
+        entry = RevenueEntry.objects.get()
+        self.assertEqual(
+            (entry.registration, entry.kind, entry.quantity, entry.amount, entry.organizer),
+            (registration, RevenueEntry.Kind.SALE, 2, Decimal(500), self.organizer),
+        )
+        self.assert_totals(500, 2)
+
+    def test_cancel_writes_single_refund(self):
+        registration = self.register()
+        registration.cancel()
+        refund = RevenueEntry.objects.get(kind=RevenueEntry.Kind.REFUND)
+        self.assertEqual((refund.quantity, refund.amount), (-2, Decimal(-500)))
+        self.assert_totals(0, 0)
+
+        # Повторная отмена уже отменённой регистрации журнал не трогает
+        registration.cancel()
+        Registration.objects.get(pk=registration.pk).cancel()
+        self.assertEqual(RevenueEntry.objects.count(), 2)
+        self.assert_totals(0, 0)
+
+    def test_cancel_of_pending_registration_writes_nothing(self):
+        self.register(confirm=False).cancel()
+        self.assertFalse(RevenueEntry.objects.exists())
+        self.assert_totals(0, 0)
+
+    def test_backfill_matches_incremental_totals(self):
+        self.register(quantity=1)
+        self.register(quantity=3)
+        self.register(quantity=2).cancel()
+        self.register(confirm=False)
+        incremental = self.totals()
+
+        # Журнал до его появления: только подтверждённые регистрации
+        RevenueEntry.objects.all().delete()
+        EventRevenue.objects.all().delete()
+        OrganizerRevenue.objects.all().delete()
+        self.assertEqual(revenue.backfill(batch_size=1), 2)
+        self.assertEqual(self.totals(), incremental)
+
+        # Повторный backfill ничего не дописывает, rebuild_totals сходится с журналом
+        self.assertEqual(revenue.backfill(), 0)
+        revenue.rebuild_totals()
+        self.assertEqual(self.totals(), incremental)
+        self.assert_totals(1000, 4)
+
+    def test_weekly_series(self):
+        created = [
+            datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc),    # понедельник
+            datetime(2026, 3, 8, 23, tzinfo=dt_timezone.utc),   # воскресенье той же недели
+            datetime(2026, 3, 9, 0, tzinfo=dt_timezone.utc),    # следующая неделя
+        ]
+        registrations = [self.register(quantity=quantity) for quantity in (1, 2, 4)]
+        registrations[2].cancel()
+        for registration, moment in zip(registrations, created):
+            RevenueEntry.objects.filter(registration=registration).update(created_at=moment)
+
+        series = revenue.series('week', event=self.event)
+        self.assertEqual(
+            [(row['period'].date(), row['amount'], row['quantity']) for row in series],
+            [(date(2026, 3, 2), Decimal(750), 3), (date(2026, 3, 9), Decimal(0), 0)],
+        )
+        since = datetime(2026, 3, 9, tzinfo=dt_timezone.utc)
+        self.assertEqual(len(revenue.series('week', organizer=self.organizer, since=since)), 1)
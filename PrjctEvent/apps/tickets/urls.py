@@ -5,6 +5,7 @@ from .views import (
     UserTickets,
     SuccessView,
     CancelView,
+    RegistrationExportView,
     stripe_webhook
 )
 
@@ -17,4 +18,5 @@ urlpatterns = [
     path('success/<int:registration_id>/', SuccessView.as_view(), name='success'),
     path('cancel/<int:registration_id>/', CancelView.as_view(), name='cancel'),
     path('webhook/stripe/', stripe_webhook, name='stripe_webhook'),
+    path('export/registrations/', RegistrationExportView.as_view(), name='export_registrations'),
 ]
@@ -1,3 +1,4 @@
+import json
 import stripe
 import logging
 from django.conf import settings
@@ -11,18 +12,17 @@ from django.utils.translation import gettext_lazy as _
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.template.response import TemplateResponse
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from .models import Registration
 from .forms import RegistrationForm
 from apps.events.models import Event
 from apps.notifications.tasks import send_notification_email
 from apps.notifications.models import Notification
-from .tasks import send_ticket_email
+from .tasks import send_ticket_email, process_stripe_events
+from . import exports, payments, webhooks
 
 logger = logging.getLogger(__name__)
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 
 class PurchaseView(LoginRequiredMixin, View):
     template_name = 'tickets/ticket_purchase.html'
@@ -40,46 +40,9 @@ class PurchaseView(LoginRequiredMixin, View):
         form = RegistrationForm(data=request.POST, event=event, user=request.user)
         if form.is_valid():
             logger.info(f"Form valid: {form.cleaned_data}")
-            with transaction.atomic():
-                registration = form.save()
-                if registration.ticket:
-                    try:
-                        logger.info("Creating Stripe session")
-                        success_url = request.build_absolute_uri(
-                            reverse('tickets:success', kwargs={'registration_id': registration.id})
-                        ) + '?session_id={CHECKOUT_SESSION_ID}'
-                        logger.info(f"Success URL: {success_url}")
-                        session = stripe.checkout.Session.create(
-                            payment_method_types=['card'],
-                            line_items=[{
-                                'price_data': {
-                                    'currency': 'rub',
-                                    'product_data': {
-                                        'name': f'{registration.ticket.get_type_display()} - {event.title}',
-                                    },
-                                    'unit_amount': int(registration.ticket.price * 100),
-                                },
-                                'quantity': registration.quantity,
-                            }],
-                            mode='payment',
-                            success_url=success_url,
-                            cancel_url=request.build_absolute_uri(
-                                reverse('tickets:cancel', kwargs={'registration_id': registration.id})
-                            ),
-                            metadata={'registration_id': str(registration.id)},
-                            idempotency_key=f'registration_{registration.id}'
-                        )
-                        logger.info(f"Stripe session created: ID={session.id}, URL={session.url}")
-                        registration.payment_id = session.id
-                        registration.save()
-                        send_ticket_email.delay(registration.id)
-                        return redirect(session.url)
-                    except stripe.StripeError as e:
-                        logger.error(f"Stripe error: {str(e)}")
-                        messages.error(request, _('Ошибка платежа. Попробуйте снова.'))
-                        registration.delete()
-                        return redirect('tickets:purchase', event_slug=event.slug)
-                else:
+            if not form.cleaned_data['ticket']:
+                with transaction.atomic():
+                    registration = form.save()
                     registration.status = Registration.Status.CONFIRMED
                     registration.save()
                     notification = Notification.objects.create(
@@ -89,10 +52,46 @@ class PurchaseView(LoginRequiredMixin, View):
                         event=event,
                         notification_type='REGISTRATION'
                     )
-                    send_notification_email.delay(notification.id)
-                    send_ticket_email.delay(registration.id)
-                    messages.success(request, _('Регистрация прошла успешно!'))
-                    return redirect('tickets:my_tickets')
+                send_notification_email.delay(notification.id)
+                send_ticket_email.delay(registration.id)
+                messages.success(request, _('Регистрация прошла успешно!'))
+                return redirect('tickets:my_tickets')
+
+            # Оформление в две фазы: короткая транзакция фиксирует PENDING-регистрацию
+            # с резервом, затем запрос к Stripe идёт уже без открытой транзакции.
+            # Если процесс упадёт между фазами, резерв снимет release_expired_holds.
+            try:
+                with transaction.atomic():
+                    registration = form.save()
+                    registration.reserve()
+            except ValueError:
+                messages.error(request, _('Недостаточно билетов.'))
+                return redirect('tickets:purchase', event_slug=event.slug)
+
+            try:
+                logger.info("Creating Stripe session")
+                success_url = request.build_absolute_uri(
+                    reverse('tickets:success', kwargs={'registration_id': registration.id})
+                ) + '?session_id={CHECKOUT_SESSION_ID}'
+                logger.info(f"Success URL: {success_url}")
+                session = payments.create_checkout_session(
+                    registration,
+                    success_url=success_url,
+                    cancel_url=request.build_absolute_uri(
+                        reverse('tickets:cancel', kwargs={'registration_id': registration.id})
+                    ),
+                )
+            except stripe.StripeError as e:
+                logger.error(f"Stripe error: {str(e)}")
+                messages.error(request, _('Ошибка платежа. Попробуйте снова.'))
+                with transaction.atomic():
+                    registration.cancel()
+                    registration.delete()
+                return redirect('tickets:purchase', event_slug=event.slug)
+
+            logger.info(f"Stripe session created: ID={session.id}, URL={session.url}")
+            Registration.objects.filter(pk=registration.pk).update(payment_id=session.id)
+            return redirect(session.url)
         logger.error(f"Form errors: {form.errors}")
         messages.error(request, _('Ошибка. Проверьте данные.'))
         context = {'form': form, 'event': event}
@@ -155,19 +154,9 @@ class SuccessView(View):
                 logger.info(f"Retrieving Stripe session: {session_id}")
                 session = stripe.checkout.Session.retrieve(session_id)
                 if session.metadata['registration_id'] == str(registration.id):
-                    with transaction.atomic():
-                        registration.confirm(session.payment_intent)
-                        notification = Notification.objects.create(
-                            user=registration.user,
-                            title=f'Покупка билета на {registration.event.title}',
-                            message=f'Ваш билет на {registration.event.title} подтверждён.',
-                            event=registration.event,
-                            notification_type='TICKET'
-                        )
-                        send_notification_email.delay(notification.id)
-                        send_ticket_email.delay(registration.id)
-                        logger.info("Payment confirmed")
-                        messages.success(request, _('Платёж подтверждён.'))
+                    webhooks.fulfil_registration(registration, session.payment_intent)
+                    logger.info("Payment confirmed")
+                    messages.success(request, _('Платёж подтверждён.'))
                 else:
                     logger.error("Session metadata does not match registration ID")
                     messages.error(request, _('Ошибка: неверный ID сессии.'))
@@ -206,32 +195,53 @@ def stripe_webhook(request):
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
     except (ValueError, stripe.StripeError) as e:
         logger.error(f"Webhook error: {str(e)}")
         return HttpResponse(status=400)
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        registration_id = session['metadata']['registration_id']
-        logger.info(f"Processing checkout.session.completed for registration_id: {registration_id}")
-        try:
-            registration = Registration.objects.get(id=registration_id)
-            with transaction.atomic():
-                registration.confirm(session.payment_intent)
-                notification = Notification.objects.create(
-                    user=registration.user,
-                    title=f"Покупка билета на {registration.event.title}",
-                    message=f"Ваш билет на {registration.event.title} подтверждён.",
-                    event=registration.event,
-                    notification_type='TICKET'
-                )
-                send_notification_email.delay(notification.id)
-                send_ticket_email.delay(registration.id)
-                logger.info("Webhook processed successfully")
-        except Registration.DoesNotExist:
-            logger.error("Registration not found")
-            return HttpResponse(status=400)
+    # Событие только сохраняется в inbox: подтверждение выполнит воркер,
+    # а повторная доставка того же event id будет проигнорирована
+    webhooks.record(json.loads(payload))
+    try:
+        process_stripe_events.delay()
+    except Exception as e:
+        # Событие уже сохранено — его подберёт периодический проход
+        logger.warning(f"Could not enqueue Stripe event processing: {e}")
     return HttpResponse(status=200)
+
+
+class RegistrationExportView(LoginRequiredMixin, View):
+    """
+    Потоковая выгрузка регистраций в CSV или XLSX (?format=xlsx).
+    Фильтры: ?event=<slug>, ?status=<статус>. Организатор видит только свои
+    события, персонал — все.
+    """
+    formats = {
+        'csv': ('text/csv; charset=utf-8', exports.stream_csv),
+        'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', exports.stream_xlsx),
+    }
+
+    def get(self, request):
+        export_format = request.GET.get('format', 'csv')
+        status = request.GET.get('status')
+        if export_format not in self.formats or (status and status not in Registration.Status.values):
+            return HttpResponse(status=400)
+
+        events = Event.objects.all() if request.user.is_staff else Event.objects.filter(author=request.user)
+        slug = request.GET.get('event')
+        if slug:
+            events = events.filter(slug=slug)
+            if not events.exists():
+                raise Http404
+        elif request.user.is_staff:
+            events = None
+
+        content_type, stream = self.formats[export_format]
+        response = StreamingHttpResponse(
+            stream(exports.rows(exports.registrations(events, status))), content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="registrations-{slug or "all"}.{export_format}"'
+        return response
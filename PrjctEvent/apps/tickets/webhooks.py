@@ -0,0 +1,131 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.notifications.models import Notification
+from apps.notifications.tasks import send_notification_email
+from .models import Registration, StripeEvent
+from . import tasks
+
+
+logger = logging.getLogger(__name__)
+
+
+def fulfil_registration(registration, payment_intent):
+    """
+    Подтверждает оплаченную регистрацию и ставит письма в очередь после коммита.
+    Возвращает False, если регистрацию уже подтвердил другой путь
+    (SuccessView, повтор webhook) — повторный вызов ничего не меняет.
+    """
+    try:
+        with transaction.atomic():
+            registration.confirm(payment_intent)
+            notification = Notification.objects.create(
+                user=registration.user,
+                title=f'Покупка билета на {registration.event.title}',
+                message=f'Ваш билет на {registration.event.title} подтверждён.',
+                event=registration.event,
+                notification_type='TICKET'
+            )
+            transaction.on_commit(lambda: send_notification_email.delay(notification.id))
+            transaction.on_commit(lambda: tasks.send_ticket_email.delay(registration.id))
+    except ValidationError:
+        registration.refresh_from_db()
+        if registration.status != Registration.Status.CONFIRMED:
+            raise
+        return False
+    return True
+
+
+def handle_checkout_completed(session):
+    registration_id = session['metadata']['registration_id']
+    try:
+        registration = Registration.objects.select_related('event', 'ticket', 'user').get(pk=registration_id)
+    except Registration.DoesNotExist:
+        # Регистрацию удалили (истёк резерв) — оплату нужно разбирать вручную
+        raise ValueError(f'Регистрация {registration_id} не найдена')
+    if fulfil_registration(registration, session['payment_intent']):
+        logger.info(f"Registration {registration_id} confirmed by webhook")
+
+
+HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+}
+
+
+def record(event):
+    """Сохраняет событие в inbox; повторная доставка того же id игнорируется."""
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event['id'], type=event['type'], payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def process(inbox):
+    handler = HANDLERS.get(inbox.type)
+    inbox.attempts += 1
+    try:
+        # Эффекты обработчика и отметка PROCESSED фиксируются одной транзакцией
+        with transaction.atomic():
+            if handler:
+                handler(inbox.payload['data']['object'])
+    except Exception as e:
+        logger.exception(f"Stripe event {inbox.event_id} failed")
+        inbox.error = str(e)
+        if inbox.attempts >= settings.STRIPE_INBOX_MAX_ATTEMPTS:
+            inbox.status = StripeEvent.Status.FAILED
+        return False
+    inbox.status = StripeEvent.Status.PROCESSED
+    inbox.error = ''
+    inbox.processed_at = timezone.now()
+    return True
+
+
+def process_pending(batch_size=None):
+    """
+    Обрабатывает inbox пачками. Каждая пачка — одна транзакция: строки
+    блокируются через SKIP LOCKED, поэтому несколько воркеров не возьмут
+    одно событие, а каждое событие выполняется в своей точке сохранения.
+    """
+    batch_size = batch_size or settings.STRIPE_INBOX_BATCH_SIZE
+    processed = 0
+    failed = set()
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StripeEvent.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=StripeEvent.Status.PENDING)
+                .exclude(pk__in=failed)
+                .order_by('received_at', 'id')[:batch_size]
+            )
+            for inbox in batch:
+                if process(inbox):
+                    processed += 1
+                else:
+                    # Повтор — при следующем запуске, а не в этом же цикле
+                    failed.add(inbox.pk)
+            StripeEvent.objects.bulk_update(batch, ['status', 'attempts', 'error', 'processed_at'])
+
+        if len(batch) < batch_size:
+            return processed
+
+
+def replay(queryset):
+    """
+    Возвращает события в очередь и обрабатывает их сразу. Обработчики
+    идемпотентны, поэтому повтор уже обработанного события безопасен.
+    """
+    ids = list(queryset.values_list('pk', flat=True))
+    StripeEvent.objects.filter(pk__in=ids).update(status=StripeEvent.Status.PENDING, attempts=0, error='')
+    batch_size = settings.STRIPE_INBOX_BATCH_SIZE
+    processed = 0
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            batch = list(StripeEvent.objects.select_for_update().filter(pk__in=ids[start:start + batch_size]))
+            processed += sum(process(inbox) for inbox in batch)
+            StripeEvent.objects.bulk_update(batch, ['status', 'attempts', 'error', 'processed_at'])
+    return processed
@@ -7,10 +7,14 @@ django_asgi_app = get_asgi_application()
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import apps.chat.routing
+import apps.notifications.routing
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter(apps.chat.routing.websocket_urlpatterns)
+        URLRouter(
+            apps.chat.routing.websocket_urlpatterns
+            + apps.notifications.routing.websocket_urlpatterns
+        )
     ),
 })
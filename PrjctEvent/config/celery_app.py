@@ -1,8 +1,60 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 app = Celery('PrjctEvent')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+
+@app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    from django.conf import settings
+
+    sender.add_periodic_task(
+        settings.EVENT_VIEWS_FLUSH_INTERVAL,
+        sender.signature('apps.events.tasks.flush_event_views'),
+        name='flush-event-views',
+    )
+    sender.add_periodic_task(
+        crontab(hour=3, minute=0),
+        sender.signature('apps.events.tasks.rebuild_archive_facets'),
+        name='rebuild-archive-facets',
+    )
+    sender.add_periodic_task(
+        settings.TICKET_HOLD_SWEEP_INTERVAL,
+        sender.signature('apps.tickets.tasks.release_expired_holds'),
+        name='release-expired-ticket-holds',
+    )
+    sender.add_periodic_task(
+        settings.NOTIFICATION_EMAIL_SWEEP_INTERVAL,
+        sender.signature('apps.notifications.tasks.dispatch_stale_notification_emails'),
+        name='dispatch-stale-notification-emails',
+    )
+    sender.add_periodic_task(
+        settings.STRIPE_INBOX_SWEEP_INTERVAL,
+        sender.signature('apps.tickets.tasks.process_stripe_events'),
+        name='process-stripe-events',
+    )
+    sender.add_periodic_task(
+        settings.ANALYTICS_ROLLUP_INTERVAL,
+        sender.signature('apps.analytics.tasks.rollup_analytics'),
+        name='rollup-analytics',
+    )
+
+
+@worker_process_init.connect
+def warm_up_ticket_renderer(**kwargs):
+    from apps.tickets.documents import warm_up
+
+    warm_up()
+
+
+@worker_process_shutdown.connect
+def close_mail_connection(**kwargs):
+    from apps.notifications.mailer import close_shared_connection
+
+    close_shared_connection()
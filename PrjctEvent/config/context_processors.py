@@ -1,10 +1,15 @@
-from apps.notifications.models import Notification
+from functools import cache
+
+from apps.notifications.counters import unread_count
+
 
 def notifications(request):
-    if request.user.is_authenticated:
-        unread_notifications = Notification.objects.filter(
-            user=request.user, is_read=False
-        ).count()
-    else:
-        unread_notifications = 0
+    # Счётчик вычисляется лениво: шаблон вызывает функцию, только если выводит
+    # unread_notifications, остальные страницы не делают ни одного запроса
+    @cache
+    def unread_notifications():
+        if not request.user.is_authenticated:
+            return 0
+        return unread_count(request.user)
+
     return {'unread_notifications': unread_notifications}
@@ -0,0 +1,171 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.template import base as template_base
+from django.utils import timezone
+
+
+# Профилирование запросов: число SQL-запросов, время SQL и рендеринга шаблонов,
+# повторяющиеся запросы (N+1). Итоги отдаются в заголовке Server-Timing и
+# складываются в кольцевой буфер процесса, доступный персоналу через profiling_view.
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """
+    Объявляет бюджет SQL-запросов для view-функции или класса.
+    При PROFILING_RAISE_ON_BUDGET (например, в тестах) превышение
+    приводит к QueryBudgetExceeded, иначе попадает в отчёт.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+_IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_current = ContextVar('profiling_stats', default=None)
+_buffer = deque(maxlen=getattr(settings, 'PROFILING_BUFFER_SIZE', 200))
+_buffer_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    # Параметры уже вынесены в %s; схлопываем списки IN разной длины
+    return _WHITESPACE_RE.sub(' ', _IN_LIST_RE.sub('(%s...)', sql)).strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        threshold = getattr(settings, 'PROFILING_DUPLICATE_THRESHOLD', 3)
+        return [
+            {'sql': sql[:500], 'count': count}
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+_original_render = template_base.Template.render
+
+
+def _timed_render(self, context):
+    stats = _current.get()
+    if stats is None:
+        return _original_render(self, context)
+    # Вложенные {% include %}/{% extends %} учитываются во внешнем шаблоне
+    stats.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        stats.template_depth -= 1
+        if stats.template_depth == 0:
+            stats.template_time += time.perf_counter() - started
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        template_base.Template.render = _timed_render
+
+    def __call__(self, request):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if getattr(request, 'skip_profiling', False):
+            return response
+
+        total = time.perf_counter() - stats.started
+        budget = getattr(request, 'query_budget', None)
+        record = {
+            'timestamp': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': getattr(request, 'profiling_view', None),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+            'queries': stats.queries,
+            'query_budget': budget,
+            'duplicates': stats.duplicates(),
+        }
+        with _buffer_lock:
+            _buffer.append(record)
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={record["sql_ms"]};desc="{stats.queries} queries"',
+            f'tpl;dur={record["template_ms"]}',
+            f'total;dur={record["total_ms"]}',
+        ])
+
+        if budget is not None and stats.queries > budget and getattr(settings, 'PROFILING_RAISE_ON_BUDGET', False):
+            raise QueryBudgetExceeded(
+                f'{record["view"]}: {stats.queries} SQL-запросов при бюджете {budget} ({record["path"]})'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.skip_profiling = getattr(view_func, 'skip_profiling', False)
+        view = getattr(view_func, 'view_class', view_func)
+        request.profiling_view = f'{view.__module__}.{view.__qualname__}'
+        budget = getattr(view_func, 'query_budget', None)
+        request.query_budget = getattr(view, 'query_budget', budget)
+
+
+def recent_requests():
+    with _buffer_lock:
+        return list(reversed(_buffer))
+
+
+@staff_member_required
+def profiling_view(request):
+    records = recent_requests()
+    path = request.GET.get('path')
+    if path:
+        records = [record for record in records if record['path'].startswith(path)]
+    if request.GET.get('duplicates'):
+        records = [record for record in records if record['duplicates']]
+    return JsonResponse({'requests': records}, json_dumps_params={'ensure_ascii': False, 'indent': 2})
+
+
+profiling_view.skip_profiling = True
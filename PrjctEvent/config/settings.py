@@ -25,7 +25,7 @@ INSTALLED_APPS = [
     'apps.tickets.apps.TicketsConfig',
     'apps.notifications.apps.NotificationsConfig',
     'apps.chat.apps.ChatConfig',
-    # 'apps.analytics.apps.AnalyticsConfig',
+    'apps.analytics.apps.AnalyticsConfig',
 
     # Библиотеки
     'django_htmx',
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 INSTALLED_APPS += ['django_celery_beat']
 
 MIDDLEWARE = [
+    'config.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     # 'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -106,6 +107,20 @@ DATABASES = {
 #     }
 # }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш HTMX-фрагментов. Файловый бэкенд общий для всех процессов на хосте
+    # и не требует Redis; для одного процесса подойдёт и locmem
+    'fragments': {
+        'BACKEND': os.getenv('FRAGMENT_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('FRAGMENT_CACHE_LOCATION', str(BASE_DIR / 'cache' / 'fragments')),
+        'TIMEOUT': int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 300)),
+    },
+}
+FRAGMENT_CACHE_ALIAS = 'fragments'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -159,6 +174,13 @@ CELERY_RESULT_SERIALIZER = os.getenv('CELERY_RESULT_SERIALIZER', 'json')
 CELERY_TIMEZONE = os.getenv('CELERY_TIMEZONE', 'UTC')
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Счётчик просмотров событий: 'redis' (общий буфер, сброс задачей Celery Beat)
+# или 'local' (буфер в памяти процесса, сброс при записи просмотра)
+EVENT_VIEWS_BUFFER = os.getenv('EVENT_VIEWS_BUFFER', 'redis')
+EVENT_VIEWS_REDIS_URL = os.getenv('EVENT_VIEWS_REDIS_URL', CELERY_BROKER_URL)
+EVENT_VIEWS_FLUSH_INTERVAL = int(os.getenv('EVENT_VIEWS_FLUSH_INTERVAL', 30))
+EVENT_VIEWS_FLUSH_BATCH_SIZE = int(os.getenv('EVENT_VIEWS_FLUSH_BATCH_SIZE', 500))
+
 # django-allauth
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
@@ -239,7 +261,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
+
+# Резерв билетов на время оплаты. Сессия Stripe (Stripe требует больше 30 минут,
+# меньшее значение поднимается до 31) истекает раньше резерва, чтобы оплата
+# не пришла после его снятия
+TICKET_CHECKOUT_TTL = int(os.getenv('TICKET_CHECKOUT_TTL', 31 * 60))
+TICKET_HOLD_TTL = int(os.getenv('TICKET_HOLD_TTL', max(TICKET_CHECKOUT_TTL, 31 * 60) + 10 * 60))
+TICKET_HOLD_SWEEP_INTERVAL = int(os.getenv('TICKET_HOLD_SWEEP_INTERVAL', 60))
+TICKET_HOLD_BATCH_SIZE = int(os.getenv('TICKET_HOLD_BATCH_SIZE', 500))
+
+# PDF-билеты: кэш на диске по (registration_id, версия); TICKET_PDF_VERSION
+# увеличивается при изменении вёрстки, не отражённом в HTML (стили, шрифты)
+TICKET_PDF_TEMPLATE = 'tickets/ticket_pdf.html'
+TICKET_PDF_VERSION = os.getenv('TICKET_PDF_VERSION', '1')
+TICKET_PDF_CACHE_DIR = os.getenv('TICKET_PDF_CACHE_DIR', str(BASE_DIR / 'cache' / 'tickets'))
 # STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+# Адрес API можно подменить на локальный фейковый сервер (manage.py fake_stripe)
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE')
+STRIPE_CONNECT_TIMEOUT = float(os.getenv('STRIPE_CONNECT_TIMEOUT', 3))
+STRIPE_READ_TIMEOUT = float(os.getenv('STRIPE_READ_TIMEOUT', 10))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv('STRIPE_MAX_NETWORK_RETRIES', 2))
+# Inbox webhook-событий: обработка задачей Celery, периодический проход подбирает пропущенное
+STRIPE_INBOX_BATCH_SIZE = int(os.getenv('STRIPE_INBOX_BATCH_SIZE', 100))
+STRIPE_INBOX_MAX_ATTEMPTS = int(os.getenv('STRIPE_INBOX_MAX_ATTEMPTS', 5))
+STRIPE_INBOX_SWEEP_INTERVAL = int(os.getenv('STRIPE_INBOX_SWEEP_INTERVAL', 60))
+# Выгрузка регистраций читает БД пачками этого размера
+REGISTRATION_EXPORT_CHUNK_SIZE = int(os.getenv('REGISTRATION_EXPORT_CHUNK_SIZE', 2000))
 
 
 # Настройки провайдеров Google и GitHub
@@ -280,3 +327,47 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Чат: сообщения пишутся в БД пачкой по CHAT_FLUSH_SIZE штук или раз в
+# CHAT_FLUSH_INTERVAL_MS; при недоступной БД в памяти держится не больше CHAT_BUFFER_LIMIT
+CHAT_FLUSH_SIZE = int(os.getenv('CHAT_FLUSH_SIZE', 200))
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv('CHAT_FLUSH_INTERVAL_MS', 250))
+CHAT_BUFFER_LIMIT = int(os.getenv('CHAT_BUFFER_LIMIT', 10000))
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv('CHAT_HISTORY_PAGE_SIZE', 50))
+# Присутствие в комнатах: пустой CHAT_PRESENCE_BACKEND — как слой каналов (redis или local).
+# CHAT_ROOM_MAX_MEMBERS = 0 — без ограничения размера комнаты
+CHAT_PRESENCE_BACKEND = os.getenv('CHAT_PRESENCE_BACKEND', '')
+CHAT_PRESENCE_REDIS_URL = os.getenv('CHAT_PRESENCE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+CHAT_PRESENCE_HEARTBEAT = int(os.getenv('CHAT_PRESENCE_HEARTBEAT', 20))
+CHAT_PRESENCE_TTL = int(os.getenv('CHAT_PRESENCE_TTL', 60))
+CHAT_ROOM_MAX_MEMBERS = int(os.getenv('CHAT_ROOM_MAX_MEMBERS', 0))
+# Исходящие сообщения комнаты собираются в один кадр раз в CHAT_COALESCE_MS (0 — без склейки);
+# входящие ограничены token bucket: CHAT_RATE_LIMIT сообщений в секунду (0 — без лимита)
+CHAT_COALESCE_MS = int(os.getenv('CHAT_COALESCE_MS', 50))
+CHAT_COALESCE_MAX_BATCH = int(os.getenv('CHAT_COALESCE_MAX_BATCH', 50))
+CHAT_RATE_LIMIT = float(os.getenv('CHAT_RATE_LIMIT', 5))
+CHAT_RATE_BURST = int(os.getenv('CHAT_RATE_BURST', 10))
+
+# Массовые уведомления: размер пачки bulk_create и одной задачи рассылки писем
+NOTIFICATION_FANOUT_CHUNK_SIZE = int(os.getenv('NOTIFICATION_FANOUT_CHUNK_SIZE', 500))
+# Письма уходят пачками через одно SMTP-соединение на воркер; неотправленные
+# старше NOTIFICATION_EMAIL_RETRY_AFTER (но моложе NOTIFICATION_EMAIL_SWEEP_MAX_AGE) секунд
+# досылает периодическая задача
+NOTIFICATION_EMAIL_BATCH_SIZE = int(os.getenv('NOTIFICATION_EMAIL_BATCH_SIZE', 100))
+NOTIFICATION_EMAIL_RETRY_AFTER = int(os.getenv('NOTIFICATION_EMAIL_RETRY_AFTER', 600))
+NOTIFICATION_EMAIL_SWEEP_INTERVAL = int(os.getenv('NOTIFICATION_EMAIL_SWEEP_INTERVAL', 300))
+NOTIFICATION_EMAIL_SWEEP_LIMIT = int(os.getenv('NOTIFICATION_EMAIL_SWEEP_LIMIT', 5000))
+NOTIFICATION_EMAIL_SWEEP_MAX_AGE = int(os.getenv('NOTIFICATION_EMAIL_SWEEP_MAX_AGE', 24 * 60 * 60))
+
+# Аналитика организаторов: дневные срезы пересчитываются периодической задачей,
+# каждый проход заново считает ANALYTICS_ROLLUP_LOOKBACK_DAYS последних дней
+ANALYTICS_ROLLUP_INTERVAL = int(os.getenv('ANALYTICS_ROLLUP_INTERVAL', 900))
+ANALYTICS_ROLLUP_LOOKBACK_DAYS = int(os.getenv('ANALYTICS_ROLLUP_LOOKBACK_DAYS', 2))
+ANALYTICS_DASHBOARD_DAYS = int(os.getenv('ANALYTICS_DASHBOARD_DAYS', 30))
+ANALYTICS_DASHBOARD_MONTHS = int(os.getenv('ANALYTICS_DASHBOARD_MONTHS', 12))
+
+# Профилирование запросов (config/profiling.py)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', str(DEBUG)) == 'True'
+PROFILING_RAISE_ON_BUDGET = os.getenv('PROFILING_RAISE_ON_BUDGET') == 'True'
+PROFILING_BUFFER_SIZE = int(os.getenv('PROFILING_BUFFER_SIZE', 200))
+PROFILING_DUPLICATE_THRESHOLD = int(os.getenv('PROFILING_DUPLICATE_THRESHOLD', 3))
@@ -3,8 +3,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.profiling import profiling_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('profiling/', profiling_view, name='profiling'),
     path('users/', include('apps.users.urls', namespace='users')),
     path('accounts/', include('allauth.urls')),
     path('events/', include('apps.events.urls', namespace='events')),
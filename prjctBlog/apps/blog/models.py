@@ -1,6 +1,6 @@
 from django.db import models
 from apps.users.models import User
-from django.utils.text import slugify
+from .slugs import save_with_unique_slug
 from taggit.managers import TaggableManager
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
@@ -20,7 +20,7 @@ class Category(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            return save_with_unique_slug(self, self.name, super().save, *args, **kwargs)
         super().save(*args, **kwargs)
 
 
@@ -58,13 +58,7 @@ class Post(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            count = 1
-            while Post.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{count}"
-                count += 1
-            self.slug = slug
+            return save_with_unique_slug(self, self.title, super().save, *args, fallback='post', **kwargs)
         super().save(*args, **kwargs)
 
     @property
@@ -0,0 +1,79 @@
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+
+# Больше цифр в суффиксе на практике не бывает; длиннее N проверит уникальный индекс
+MAX_SUFFIX_DIGITS = 10
+
+
+def _stem(base, digits, max_length):
+    """Основа слага с суффиксом из digits цифр: длинный base обрезается под суффикс."""
+    return base[:max_length - digits - 1].rstrip('-')
+
+
+def _suffix_regex(base, max_length):
+    """
+    Регулярка для занятых base-N. Пока base не обрезается, это base-[0-9]+;
+    у длинного base для каждой длины N своя основа, поэтому и своя ветка.
+    """
+    widths = {}
+    for digits in range(1, MAX_SUFFIX_DIGITS + 1):
+        widths.setdefault(_stem(base, digits, max_length), []).append(digits)
+    alternatives = [
+        f'{re.escape(stem)}-[0-9]+' if len(digits) == MAX_SUFFIX_DIGITS
+        else '|'.join(f'{re.escape(stem)}-[0-9]{{{width}}}' for width in digits)
+        for stem, digits in widths.items()
+    ]
+    return '^(%s)$' % '|'.join(alternatives)
+
+
+def allocate_slug(instance, source, field='slug', fallback=None):
+    """
+    Подбирает свободный слаг одним запросом: среди занятых base и base-N
+    берётся наибольший N. Если base не обрезается под суффикс, это самый
+    длинный слаг (затем лексикографически); для длинного base основа зависит
+    от длины N, и максимум ищется среди всех совпадений.
+    """
+    model = type(instance)
+    max_length = model._meta.get_field(field).max_length
+    base = slugify(source)[:max_length].strip('-') or fallback or model._meta.model_name
+
+    taken = (
+        model._default_manager
+        .filter(Q(**{field: base}) | Q(**{
+            f'{field}__startswith': _stem(base, MAX_SUFFIX_DIGITS, max_length),
+            f'{field}__regex': _suffix_regex(base, max_length),
+        }))
+        .exclude(pk=instance.pk)
+    )
+    if len(base) + 1 + MAX_SUFFIX_DIGITS <= max_length:
+        taken = taken.annotate(slug_length=Length(field)).order_by('-slug_length', f'-{field}')[:1]
+    taken = list(taken.values_list(field, flat=True))
+    if not taken:
+        return base
+
+    counter = max((int(slug.rsplit('-', 1)[1]) for slug in taken if slug != base), default=0) + 1
+    suffix = f'-{counter}'
+    return f'{_stem(base, len(suffix) - 1, max_length)}{suffix}'
+
+
+def save_with_unique_slug(instance, source, save, *args, field='slug', fallback=None, attempts=5, **kwargs):
+    """
+    Сохраняет объект со свежевыделенным слагом. При гонке двух одновременных
+    созданий уникальный индекс отклонит одно из них — тогда слаг подбирается заново.
+    """
+    model = type(instance)
+    for attempt in range(attempts):
+        setattr(instance, field, allocate_slug(instance, source, field=field, fallback=fallback))
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            slug = getattr(instance, field)
+            collided = model._default_manager.filter(**{field: slug}).exclude(pk=instance.pk).exists()
+            if not collided or attempt == attempts - 1:
+                raise
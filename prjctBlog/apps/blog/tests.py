@@ -1,3 +1,16 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Post
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(email='author@example.com', password=None)
+
+    def test_long_title_keeps_counting_after_truncation(self):
+        # Заголовок длиннее слага: суффикс отрезает хвост base, b…b-1 уже не начинается с base
+        slugs = [Post.objects.create(title='b' * 150, body='-', author=self.author).slug for _ in range(12)]
+        self.assertEqual(len(set(slugs)), 12)
+        self.assertEqual(slugs[11], 'b' * 47 + '-11')
+        self.assertTrue(all(len(slug) <= 50 for slug in slugs))